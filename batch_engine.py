@@ -0,0 +1,750 @@
+import contextlib
+import os
+import importlib
+import multiprocessing
+import signal
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from chips_logging import get_logger, file_trace, trace_debug, configure_logging, logging_config
+from utils import xps_to_text, xps_report_text, group_related_files, get_file_prefix, merge_data
+from report_parser import parse_body_composition
+from report_splitter import split_reports, iter_text_reports, iter_xps_reports
+from batch_output import CombinedCsvWriter, ColumnarWriter, combined_output_path, COLUMNAR_FORMATS
+from manifest import Manifest, fingerprint
+from pairing_index import PairingIndex
+from timing import StageTimer, TimingReport, write_timing_report
+from progress import ProgressTracker, PROGRESS_INTERVAL, input_size
+from pipeline import WriteBehind
+
+# Study emitters, keyed by the study type shown in the GUI. Every selected
+# study is written from the same parse of each file. Each processor module
+# provides OUTPUT_COLUMNS, build_output_values, format_output_row,
+# apply_formulas and write_output_csv. They are imported by study_processor()
+# when first needed, which keeps numpy out of the GUI's start-up.
+STUDY_PROCESSORS = {
+    "Cuirass": "cuirass_processor",
+    "FUVID": "fuvid_processor",
+}
+STUDY_TYPES = tuple(STUDY_PROCESSORS)
+
+# File types picked up from input directories
+INPUT_EXTENSIONS = (".xps", ".txt")
+
+log = get_logger("engine")
+
+# Rows buffered per study before derived columns are computed in one go and
+# the rows are handed to the combined/columnar writers.
+ROW_BATCH_SIZE = 256
+
+# Execution backends for the worker pool. "process" sidesteps the GIL for
+# parsing; "thread" avoids process start-up and pickling, which can win when
+# most of the time is spent inside fitz.
+BACKENDS = ("process", "thread")
+DEFAULT_BACKEND = os.environ.get("CHIPS_BACKEND", "process")
+
+class BatchCancelled(BaseException):
+    """Raised inside a work item when its batch is aborted.
+
+    A BaseException, like KeyboardInterrupt, so that the per-file error
+    handling does not count an aborted file as failed.
+    """
+
+class BatchControl:
+    """Pause and cancel switches for a running batch.
+
+    The methods may be called from any thread (the GUI thread, a signal
+    handler) while run_batch is running. Pausing and cancelling stop new work
+    from being scheduled; work in flight still finishes. cancel(abort=True)
+    also stops work in flight at its next stage boundary, before anything
+    else is read or written, so no output file is left half written.
+    """
+
+    def __init__(self):
+        self._cancelled = threading.Event()
+        self._aborted = threading.Event()
+        self._running = threading.Event()
+        self._running.set()
+
+    def cancel(self, abort=False):
+        self._cancelled.set()
+        if abort:
+            self._aborted.set()
+        self._running.set()
+
+    def pause(self):
+        if not self._cancelled.is_set():
+            self._running.clear()
+
+    def resume(self):
+        self._running.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    @property
+    def aborted(self):
+        return self._aborted.is_set()
+
+    @property
+    def abort_event(self):
+        """threading.Event set on cancel(abort=True), for work running in this process."""
+        return self._aborted
+
+    @property
+    def paused(self):
+        return not self._running.is_set()
+
+    def wait_while_paused(self, timeout=None):
+        """Block while paused; returns False if still paused after timeout."""
+        return self._running.wait(timeout)
+
+# Abort flag of the batch a worker process belongs to, set by _init_worker
+_worker_abort_event = None
+
+def _check_abort(abort_event):
+    event = abort_event or _worker_abort_event
+    if event is not None and event.is_set():
+        raise BatchCancelled()
+
+def default_worker_count():
+    """Number of workers to use when none is configured."""
+    return os.cpu_count() or 1
+
+def iter_input_files(directory, recursive=True):
+    """Yield the input files in directory, sorted by name within each directory.
+
+    The tree is walked lazily with os.scandir, a directory's files before its
+    subdirectories as with os.walk, so callers can use the first files while
+    a large tree is still being read. Symlinked directories are not followed
+    and unreadable directories are skipped with a warning.
+    """
+    try:
+        with os.scandir(directory) as it:
+            entries = sorted(it, key=lambda entry: entry.name)
+    except OSError as e:
+        log.warning("Cannot read directory %s: %s", directory, e)
+        return
+    subdirectories = []
+    for entry in entries:
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                subdirectories.append(entry.path)
+            elif entry.name.lower().endswith(INPUT_EXTENSIONS) and entry.is_file():
+                yield entry.path
+        except OSError:
+            continue
+    if recursive:
+        for subdirectory in subdirectories:
+            yield from iter_input_files(subdirectory)
+
+def study_processor(study):
+    """The processor module for a study type."""
+    return importlib.import_module(STUDY_PROCESSORS[study])
+
+def normalize_studies(studies):
+    """Accept a single study type or a sequence of them; return a list."""
+    if isinstance(studies, str):
+        studies = [studies]
+    studies = list(studies)
+    for study in studies:
+        if study not in STUDY_PROCESSORS:
+            raise ValueError(f"Unknown study type '{study}', expected one of {STUDY_TYPES}")
+    return studies
+
+def study_output_dir(output_dir, study, studies):
+    """Output directory for one study.
+
+    A single study writes straight into output_dir, as it always has. When
+    several studies are emitted at once, each gets its own subdirectory so the
+    *_output.csv names do not collide.
+    """
+    if len(studies) == 1:
+        return output_dir
+    path = os.path.join(output_dir, study)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def emit_outputs(data, output_dir, studies, file_name, per_file_output=True,
+                 records=None, source_files=(), prefix=None, timer=None, append=False):
+    """Build the output values for every selected study from one parsed result.
+
+    When per_file_output is set, each row is also written to file_name in the
+    study's output directory (added to it with append); otherwise the derived
+    formula columns are left for run_batch to compute over many rows at once.
+    If records is a list, a (source_files, prefix, {study: values}) tuple is
+    appended to it for the combined batch output. All studies are attempted
+    even if one fails; the rows that did succeed are kept and the first error
+    is re-raised afterwards so the file is still counted as an error. Stage
+    times are added to timer, a StageTimer, if given.
+    """
+    timer = timer or StageTimer()
+    rows = {}
+    first_error = None
+    for study in studies:
+        processor = study_processor(study)
+        try:
+            with timer.stage("build"):
+                row = processor.build_output_values(data)
+            if per_file_output:
+                with timer.stage("formulas"):
+                    processor.apply_formulas([row])
+            rows[study] = row
+            if per_file_output:
+                output_file = os.path.join(study_output_dir(output_dir, study, studies), file_name)
+                with timer.stage("write"):
+                    processor.write_output_csv(row, output_file, append)
+        except Exception as e:
+            if first_error is None:
+                first_error = e
+    if records is not None and rows:
+        records.append((list(source_files), prefix, rows))
+    if first_error is not None:
+        raise first_error
+
+def read_input(file, cache=None):
+    """Return the text of the first report in an XPS input file.
+
+    The file is extracted with xps_report_text, which skips the pages the
+    parsers would discard anyway. When an ExtractionCache is given, previously
+    extracted text is reused and fitz is not touched.
+    """
+    if cache is not None:
+        return cache.get_or_extract(file, xps_report_text)
+    return xps_report_text(file)
+
+def read_reports(file, cache=None, multi_report_xps=False):
+    """Yield the text of every report in an input file, one at a time.
+
+    Text exports are always split into their reports (see report_splitter).
+    XPS extraction normally stops after the first report, which keeps single
+    report exports fast; multi_report_xps reads XPS exports to the end
+    instead. With an ExtractionCache, such an export is extracted and cached
+    as a whole and then split.
+    """
+    if not file.lower().endswith('.xps'):
+        yield from iter_text_reports(file)
+    elif not multi_report_xps:
+        yield from split_reports(read_input(file, cache))
+    elif cache is not None:
+        yield from split_reports(cache.get_or_extract(file, xps_to_text, mode="full"))
+    else:
+        yield from iter_xps_reports(file)
+
+def read_single_report(file, cache=None, multi_report_xps=False):
+    """Text of the report in file, "" if it has none, or None if it holds several."""
+    with contextlib.closing(read_reports(file, cache, multi_report_xps)) as reports:
+        content = next(reports, "")
+        return content if next(reports, None) is None else None
+
+def process_single_file(file, output_dir, studies, cache=None, per_file_output=True, records=None,
+                        timer=None, abort_event=None, parsed=None, multi_report_xps=False):
+    """Parse one file and write its output CSV for each study. Returns True on success.
+
+    Every report in the file (see read_reports) becomes one row of its output
+    CSV. Exports holding several reports are converted one report at a time,
+    and their rows are labelled <file>#<report number> in combined outputs.
+    The file only counts as a success if all of its reports were converted;
+    the rows of the others are written regardless.
+
+    records and timer are passed through to emit_outputs. If parsed is a
+    list, the parsed result of every report is appended to it, whether or
+    not its outputs could be written. Raises
+    BatchCancelled before reading or writing once abort_event is set.
+    """
+    timer = timer or StageTimer()
+    try:
+        studies = normalize_studies(studies)
+        _check_abort(abort_event)
+        output_name = group_output_name(None, [file])
+        prefix = get_file_prefix(file)
+        with contextlib.closing(read_reports(file, cache, multi_report_xps)) as reports:
+            with timer.stage("extract"):
+                content = next(reports, None)
+                upcoming = next(reports, None)
+            if content is None:
+                log.warning("No report found in %s", file)
+                return False
+            several = upcoming is not None
+
+            number = written = failed = 0
+            while content is not None:
+                number += 1
+                source = f"{file}#{number}" if several else file
+                try:
+                    with timer.stage("parse"):
+                        parsed_data = parse_body_composition(content)
+                    if parsed_data:
+                        if parsed is not None:
+                            parsed.append(parsed_data)
+                        _check_abort(abort_event)
+                        emit_outputs(parsed_data, output_dir, studies, output_name, per_file_output,
+                                     records, [source], prefix, timer, append=written > 0)
+                        written += 1
+                    else:
+                        failed += 1
+                except Exception as e:
+                    failed += 1
+                    log.error("Error processing %s: %s", source, e, exc_info=True)
+
+                content = upcoming
+                if content is not None:
+                    _check_abort(abort_event)
+                    with timer.stage("extract"):
+                        upcoming = next(reports, None)
+        if several:
+            log.info("Converted %d of %d reports in %s", number - failed, number, file)
+        return failed == 0
+    except Exception as e:
+        log.error("Error processing %s: %s", file, e, exc_info=True)
+        return False
+
+def group_output_name(prefix, files):
+    """Name of the per-file CSV a work item is written to."""
+    if prefix is not None and len(files) == 2:
+        return f"{prefix}_merged_output.csv"
+    return f"{os.path.splitext(os.path.basename(files[0]))[0]}_output.csv"
+
+def is_up_to_date(manifest, prefix, files, output_dir, studies):
+    """True if the manifest has files converted into output_dir for every study.
+
+    A lone half of a pair is up to date whether it was written on its own or
+    merged with a partner from an earlier batch.
+    """
+    output_names = [group_output_name(prefix, files)]
+    if prefix is not None and len(files) == 1:
+        output_names.append(f"{prefix}_merged_output.csv")
+    for study in studies:
+        study_dir = study_output_dir(output_dir, study, studies)
+        if not any(manifest.is_up_to_date(study, files, [os.path.join(study_dir, name)])
+                   for name in output_names):
+            return False
+    return True
+
+def process_group(prefix, files, output_dir, studies, cache=None, per_file_output=True,
+                  collect_rows=False, fingerprint_inputs=False, abort_event=None, partner=None,
+                  multi_report_xps=False):
+    """Process one prefix group (or a standalone file when prefix is None).
+
+    partner is the stored half of the pair from an earlier batch (see
+    PairingIndex.partner_for) for a group of one file. Returns the success,
+    errors, merged, merged_with_earlier, processed and cancelled counts, with
+    'paired' and 'unmatched' for the PairingIndex, the output 'records' with
+    collect_rows, the input 'fingerprints' with fingerprint_inputs, and the
+    per-stage 'timings'. Setting abort_event stops the group before its next
+    read or write. Log records are only written out if a file fails.
+    """
+    fingerprints = None
+    if fingerprint_inputs:
+        try:
+            fingerprints = {f: fingerprint(f) for f in files}
+        except OSError:
+            pass  # Reported as a processing error below
+
+    timer = StageTimer()
+    with file_trace(";".join(files)) as trace:
+        try:
+            counts = _process_group(prefix, files, output_dir, studies, cache, per_file_output,
+                                    collect_rows, timer, abort_event, partner, multi_report_xps)
+        except BatchCancelled:
+            counts = {'success': 0, 'errors': 0, 'merged': 0, 'merged_with_earlier': 0,
+                      'processed': len(files), 'cancelled': len(files)}
+            log.info("Cancelled before converting %s", ";".join(files))
+        if counts['errors']:
+            trace.fail()
+        trace_debug(log, "Processed group %s: %d succeeded, %d failed, %d merged",
+                    prefix, counts['success'], counts['errors'], counts['merged'])
+    counts['fingerprints'] = fingerprints
+    counts['timings'] = [(";".join(files), timer.stages)] if timer.stages else []
+    counts['cache_bytes'] = cache.untracked_bytes if cache is not None else 0
+    return counts
+
+def _process_group(prefix, files, output_dir, studies, cache, per_file_output, collect_rows, timer,
+                   abort_event, partner, multi_report_xps):
+    counts = {'success': 0, 'errors': 0, 'merged': 0, 'merged_with_earlier': 0, 'processed': 0,
+              'cancelled': 0, 'paired': [], 'unmatched': []}
+    records = [] if collect_rows else None
+    if collect_rows:
+        counts['records'] = records
+    studies = normalize_studies(studies)
+
+    def convert_separately(files):
+        for file in files:
+            if process_single_file(file, output_dir, studies, cache, per_file_output, records, timer,
+                                   abort_event, multi_report_xps=multi_report_xps):
+                counts['success'] += 1
+            else:
+                counts['errors'] += 1
+            counts['processed'] += 1
+        return counts
+
+    if prefix is None:
+        return convert_separately(files)
+
+    try:
+        if len(files) == 2:
+            _check_abort(abort_event)
+            with timer.stage("extract"):
+                content1 = read_single_report(files[0], cache, multi_report_xps)
+                _check_abort(abort_event)
+                content2 = read_single_report(files[1], cache, multi_report_xps)
+            if content1 is None or content2 is None:
+                log.warning("Files with prefix %s hold several reports, converting them separately",
+                            prefix)
+                return convert_separately(files)
+            with timer.stage("parse"):
+                data1 = parse_body_composition(content1)
+                data2 = parse_body_composition(content2)
+
+            merged_data = None
+            if data1.report_format != data2.report_format:
+                standard_data = data1 if data1.report_format == "standard" else data2
+                numeric_data = data1 if data1.report_format == "numeric" else data2
+
+                with timer.stage("merge"):
+                    merged_data = merge_data(standard_data, numeric_data)
+
+            _check_abort(abort_event)
+            if merged_data:
+                emit_outputs(merged_data, output_dir, studies, f"{prefix}_merged_output.csv",
+                             per_file_output, records, files, prefix, timer)
+                counts['merged'] += 1
+                counts['success'] += 2
+                counts['paired'].append(prefix)
+            else:
+                # Two reports of the same kind: write each one on its own
+                log.warning("Files with prefix %s are not a standard/numeric pair, "
+                            "converting them separately", prefix)
+                for file, data in zip(files, (data1, data2)):
+                    emit_outputs(data, output_dir, studies, group_output_name(None, [file]),
+                                 per_file_output, records, [file], prefix, timer)
+                    counts['success'] += 1
+            counts['processed'] += 2
+        elif partner is not None:
+            _check_abort(abort_event)
+            with timer.stage("extract"):
+                content = read_single_report(files[0], cache, multi_report_xps)
+            if content is None:
+                return convert_separately(files)
+            with timer.stage("parse"):
+                data = parse_body_composition(content)
+
+            merged_data = None
+            if data and data.report_format != partner["format"]:
+                if data.report_format == "standard":
+                    standard_data, numeric_data = data, partner["data"]
+                else:
+                    standard_data, numeric_data = partner["data"], data
+                with timer.stage("merge"):
+                    merged_data = merge_data(standard_data, numeric_data)
+
+            _check_abort(abort_event)
+            if merged_data:
+                log.info("Merging %s with %s from an earlier batch", files[0], partner["file"])
+                emit_outputs(merged_data, output_dir, studies, f"{prefix}_merged_output.csv",
+                             per_file_output, records, [partner["file"], files[0]], prefix, timer)
+                counts['merged_with_earlier'] += 1
+                counts['success'] += 1
+                counts['paired'].append(prefix)
+            elif data:
+                # Stored even if its outputs fail, e.g. a numeric half FUVID
+                # cannot convert alone, so a later partner still finds it
+                counts['unmatched'].append((prefix, files[0], data))
+                emit_outputs(data, output_dir, studies, group_output_name(None, files),
+                             per_file_output, records, files, prefix, timer)
+                counts['success'] += 1
+            else:
+                counts['errors'] += 1
+            counts['processed'] += 1
+        else:
+            parsed = []
+            if process_single_file(files[0], output_dir, studies, cache, per_file_output, records,
+                                   timer, abort_event, parsed, multi_report_xps):
+                counts['success'] += 1
+            else:
+                counts['errors'] += 1
+            if len(parsed) == 1:
+                counts['unmatched'].append((prefix, files[0], parsed[0]))
+            counts['processed'] += 1
+
+    except Exception as e:
+        counts['errors'] += 1
+        counts['processed'] += len(files)
+        log.error("Error processing files with prefix %s: %s", prefix, e, exc_info=True)
+
+    return counts
+
+def build_tasks(files):
+    """Split the input files into (prefix, files) work items.
+
+    Prefix groups come first, followed by one item per standalone file with
+    a prefix of None, matching the order the GUI has always processed them in.
+    A prefix shared by more than two files cannot be paired, so each of its
+    files becomes a standalone item.
+    """
+    tasks = []
+    standalone = []
+    for prefix, group in group_related_files(files).items():
+        if len(group) > 2:
+            log.warning("Prefix %s is shared by %d files, converting each on its own",
+                        prefix, len(group))
+            standalone.extend(group)
+        else:
+            tasks.append((prefix, group))
+    standalone.extend(f for f in files if get_file_prefix(f) is None)
+    tasks.extend((None, [f]) for f in standalone)
+    return tasks
+
+def _init_worker(log_level, json_format, abort_event):
+    global _worker_abort_event
+    # Ctrl+C reaches the whole process group; cancellation is the parent's call.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    configure_logging(log_level, json_format)
+    _worker_abort_event = abort_event
+
+def create_executor(max_workers, backend, abort_event=None):
+    """Worker pool for run_batch.
+
+    For the process backend, abort_event must come from the spawn context;
+    it is handed to every worker when it starts.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}', expected one of {BACKENDS}")
+    if backend == "thread":
+        return ThreadPoolExecutor(max_workers=max_workers)
+    # Workers are spawned rather than forked: the GUI calls this from a
+    # QThread, and forking a multi-threaded Qt process is not safe.
+    return ProcessPoolExecutor(max_workers=max_workers,
+                               mp_context=multiprocessing.get_context("spawn"),
+                               initializer=_init_worker,
+                               initargs=(*logging_config(), abort_event))
+
+def close_writers(writers):
+    for study_writers in writers.values():
+        for writer in study_writers:
+            writer.close()
+
+def run_batch(files, output_dir, studies, max_workers=None,
+              backend=DEFAULT_BACKEND, on_progress=None, cache=None,
+              per_file_output=True, combined_output=False, columnar_format=None,
+              incremental=False, timing_report=True, control=None, pair_across_batches=True,
+              multi_report_xps=False):
+    """Process a batch of files on a pool of workers.
+
+    Each file is extracted and parsed once and written out for every study
+    in studies: one CSV per scan with per_file_output, one
+    <study>_combined_output.csv with combined_output, and typed columns with
+    columnar_format ("parquet" or "feather"). incremental skips inputs that
+    are unchanged since the last run (manifest.py), and pair_across_batches
+    merges a half with its partner from an earlier batch (pairing_index.py).
+    multi_report_xps converts every report in XPS exports, not just the first.
+
+    cache is an optional ExtractionCache shared by all workers, which the
+    batch evicts from as worker processes report what they wrote. on_progress
+    gets progress snapshots (progress.py), and control, a BatchControl, lets
+    another thread pause or cancel the batch.
+
+    Returns the success, errors, merged, merged_with_earlier, skipped and
+    cancelled counts, and the stage timings under 'timing', which
+    timing_report also writes to chips_timing.json.
+    """
+    if not (per_file_output or combined_output or columnar_format):
+        raise ValueError("No output selected: enable per-file, combined or columnar output")
+
+    collect_rows = bool(combined_output or columnar_format)
+    if incremental and collect_rows:
+        raise ValueError("Incremental runs only support per-file output")
+
+    start_time = time.perf_counter()
+    timing = TimingReport()
+    totals = {'success': 0, 'errors': 0, 'merged': 0, 'merged_with_earlier': 0, 'skipped': 0,
+              'cancelled': 0}
+    studies = normalize_studies(studies)
+    tasks = build_tasks(files)
+    max_workers = max_workers or default_worker_count()
+
+    progress = None
+    if on_progress:
+        sizes = {file: input_size(file) for file in files}
+        progress = ProgressTracker(len(files), sum(sizes.values()), on_progress)
+
+    def group_size(group):
+        return sum(sizes[file] for file in group)
+
+    manifest = Manifest(output_dir) if incremental else None
+    if manifest is not None:
+        outdated = []
+        for prefix, group in tasks:
+            if is_up_to_date(manifest, prefix, group, output_dir, studies):
+                totals['skipped'] += len(group)
+                if progress:
+                    progress.skip(len(group), group_size(group))
+            else:
+                outdated.append((prefix, group))
+        log.info("Skipping %d up-to-date files", totals['skipped'])
+        tasks = outdated
+
+    pairing = PairingIndex(output_dir) if pair_across_batches else None
+
+    def partner_for(prefix, group):
+        if pairing is None or prefix is None or len(group) != 1:
+            return None
+        return pairing.partner_for(prefix, group[0])
+
+    writers = {study: [] for study in studies}
+    try:
+        for study in studies:
+            processor = study_processor(study)
+            columns = processor.OUTPUT_COLUMNS
+            study_dir = study_output_dir(output_dir, study, studies)
+            if combined_output:
+                writers[study].append(CombinedCsvWriter(combined_output_path(study_dir, study), columns,
+                                                        processor.format_output_row))
+            if columnar_format:
+                path = combined_output_path(study_dir, study, COLUMNAR_FORMATS[columnar_format])
+                writers[study].append(ColumnarWriter(path, columns, columnar_format))
+    except Exception:
+        close_writers(writers)
+        raise
+
+    buffered_rows = {study: [] for study in studies}
+    write_behind = WriteBehind() if collect_rows else None
+
+    def write_rows(study, buffered):
+        # Runs on the write-behind thread
+        if not per_file_output:
+            started = time.perf_counter()
+            study_processor(study).apply_formulas([row for _, _, row in buffered])
+            timing.add_batch("formulas", time.perf_counter() - started)
+        started = time.perf_counter()
+        for source_files, prefix, row in buffered:
+            for writer in writers[study]:
+                writer.write_row(source_files, prefix, row)
+        timing.add_batch("write", time.perf_counter() - started)
+
+    def write_buffered_rows(study):
+        if buffered_rows[study]:
+            write_behind.submit(write_rows, study, buffered_rows[study])
+            buffered_rows[study] = []
+
+    def collect(counts, group):
+        for source_files, prefix, rows in counts.get('records', ()):
+            for study, row in rows.items():
+                buffered_rows[study].append((source_files, prefix, row))
+                if len(buffered_rows[study]) >= ROW_BATCH_SIZE:
+                    write_buffered_rows(study)
+        for key in ('success', 'errors', 'merged', 'merged_with_earlier', 'cancelled'):
+            totals[key] += counts[key]
+        for label, stages in counts['timings']:
+            timing.add(label, stages)
+        if counts['cache_bytes']:
+            # Written by a worker process's copy of the cache
+            cache.add_size(counts['cache_bytes'])
+        if pairing is not None:
+            pairing.update(counts)
+        if manifest is not None and counts['fingerprints'] and not counts['errors']:
+            group = list(counts['fingerprints'])
+            for study in studies:
+                manifest.record(study, group, counts['fingerprints'])
+        if progress:
+            progress.advance(counts['processed'], group_size(group))
+
+    def accepting_work():
+        return control is None or not (control.cancelled or control.paused)
+
+    inline = max_workers == 1 or len(tasks) <= 1
+    next_task = 0
+    try:
+        if inline:
+            abort_event = control.abort_event if control is not None else None
+            while next_task < len(tasks):
+                if control is not None:
+                    control.wait_while_paused()
+                    if control.cancelled:
+                        break
+                prefix, group = tasks[next_task]
+                next_task += 1
+                collect(process_group(prefix, group, output_dir, studies, cache,
+                                      per_file_output, collect_rows, incremental, abort_event,
+                                      partner_for(prefix, group), multi_report_xps),
+                        group)
+            return totals
+
+        # Keep only a few tasks per worker in flight so finished results
+        # (and their rows) are released as soon as they are collected.
+        max_workers = min(max_workers, len(tasks))
+        window = max_workers * 2
+        pending = {}
+        # Threads share the control's abort flag. Worker processes get a
+        # process-shared copy when they start, set from the loop below.
+        worker_abort_event = task_abort_event = None
+        if control is not None:
+            if backend == "process":
+                worker_abort_event = multiprocessing.get_context("spawn").Event()
+            else:
+                task_abort_event = control.abort_event
+
+        def submit_more():
+            nonlocal next_task
+            while next_task < len(tasks) and len(pending) < window and accepting_work():
+                prefix, group = tasks[next_task]
+                next_task += 1
+                future = executor.submit(process_group, prefix, group, output_dir, studies, cache,
+                                         per_file_output, collect_rows, incremental, task_abort_event,
+                                         partner_for(prefix, group), multi_report_xps)
+                pending[future] = group
+
+        aborting = False
+        wait_timeout = 0.2 if control is not None else (PROGRESS_INTERVAL if progress else None)
+        with create_executor(max_workers, backend, worker_abort_event) as executor:
+            while True:
+                if control is not None and control.aborted and not aborting:
+                    aborting = True
+                    if worker_abort_event is not None:
+                        worker_abort_event.set()
+                    for future, group in pending.items():
+                        if future.cancel():
+                            totals['cancelled'] += len(group)
+                submit_more()
+                if not pending:
+                    if next_task >= len(tasks) or control.cancelled:
+                        break
+                    control.wait_while_paused(0.2)
+                    if progress:
+                        progress.poll()
+                    continue
+                # Poll while a control is attached so pause/cancel take effect
+                # promptly, and keep elapsed time and ETA moving during slow files
+                done, _ = wait(pending, timeout=wait_timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    group = pending.pop(future)
+                    if not future.cancelled():
+                        collect(future.result(), group)
+                if progress:
+                    progress.poll()
+
+        return totals
+    finally:
+        totals['cancelled'] += sum(len(group) for _, group in tasks[next_task:])
+        if totals['cancelled']:
+            log.info("Batch cancelled, %d files were not converted", totals['cancelled'])
+        try:
+            if write_behind is not None:
+                try:
+                    for study in studies:
+                        write_buffered_rows(study)
+                finally:
+                    write_behind.close()
+        finally:
+            close_writers(writers)
+            if manifest is not None:
+                manifest.save()
+            if pairing is not None:
+                pairing.save()
+            totals['timing'] = timing.summary(time.perf_counter() - start_time)
+            if timing_report:
+                write_timing_report(totals['timing'], output_dir)
+            if progress:
+                progress.finish()
@@ -0,0 +1,146 @@
+import csv
+import os
+
+from utils import str_to_float
+
+# Columns prepended to every row of a combined batch output
+KEY_COLUMNS = ["Source File", "Prefix"]
+
+def combined_output_path(output_dir, study, extension="csv"):
+    return os.path.join(output_dir, f"{study}_combined_output.{extension}")
+
+def format_source(source_files):
+    """Source column value: the input file name(s) a row was built from."""
+    return ";".join(os.path.basename(f) for f in source_files)
+
+class CombinedCsvWriter:
+    """Streams the rows of a whole batch into one CSV with a single header.
+
+    Rows are written as soon as they are handed over, so memory use does not
+    grow with the size of the batch. format_row, e.g. a processor's
+    format_output_row, turns each row of output values into value strings;
+    without it rows are written as given.
+    """
+
+    def __init__(self, output_file, columns, format_row=None):
+        self.output_file = output_file
+        self.format_row = format_row
+        self.row_count = 0
+        self._file = open(output_file, 'w', newline='')
+        self._writer = csv.DictWriter(self._file, fieldnames=KEY_COLUMNS + list(columns))
+        self._writer.writeheader()
+
+    def write_row(self, source_files, prefix, output_data):
+        row = {"Source File": format_source(source_files), "Prefix": prefix or ""}
+        row.update(self.format_row(output_data) if self.format_row else output_data)
+        self._writer.writerow(row)
+        self.row_count += 1
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+# Columnar output formats and their file extensions
+COLUMNAR_FORMATS = {
+    "parquet": "parquet",
+    "feather": "feather",
+}
+
+def _to_float(value):
+    """Typed value for a columnar cell; blanks and "ERROR" become nulls.
+
+    Output values are mostly floats already; only the columns copied from the
+    report as text are parsed.
+    """
+    if isinstance(value, float):
+        return value
+    if not value:
+        return None
+    try:
+        return str_to_float(value)
+    except ValueError:
+        return None
+
+class ColumnarWriter:
+    """Writes the rows of a batch to Parquet or Feather with typed columns.
+
+    Rows are the typed output values of the processors. Study columns are
+    stored as float64 (blank or failed values are null), and the key columns
+    as strings. Rows are buffered and written one row
+    group (Parquet) or record batch (Feather) at a time, so memory stays
+    bounded by row_group_size. Feather files are written uncompressed so they
+    can be memory-mapped. Requires pyarrow.
+    """
+
+    def __init__(self, output_file, columns, file_format="parquet", row_group_size=1024):
+        if file_format not in COLUMNAR_FORMATS:
+            raise ValueError(f"Unknown columnar format '{file_format}', "
+                             f"expected one of {tuple(COLUMNAR_FORMATS)}")
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise ImportError("Parquet/Feather output requires pyarrow (pip install pyarrow)")
+
+        self._pa = pa
+        self.output_file = output_file
+        self.file_format = file_format
+        self.row_group_size = row_group_size
+        self.row_count = 0
+        self.columns = list(columns)
+        self.schema = pa.schema(
+            [pa.field(name, pa.string()) for name in KEY_COLUMNS]
+            + [pa.field(name, pa.float64()) for name in self.columns]
+        )
+        self._buffer = {name: [] for name in self.schema.names}
+        self._buffered = 0
+
+        if file_format == "parquet":
+            import pyarrow.parquet as pq
+            self._writer = pq.ParquetWriter(output_file, self.schema)
+        else:
+            import pyarrow.ipc
+            self._sink = pa.OSFile(output_file, 'wb')
+            self._writer = pa.ipc.new_file(self._sink, self.schema)
+
+    def write_row(self, source_files, prefix, output_data):
+        self._buffer["Source File"].append(format_source(source_files))
+        self._buffer["Prefix"].append(prefix or "")
+        for name in self.columns:
+            self._buffer[name].append(_to_float(output_data.get(name)))
+        self._buffered += 1
+        self.row_count += 1
+        if self._buffered >= self.row_group_size:
+            self._flush()
+
+    def _flush(self):
+        if not self._buffered:
+            return
+        batch = self._pa.record_batch(
+            [self._pa.array(self._buffer[field.name], type=field.type) for field in self.schema],
+            schema=self.schema
+        )
+        self._writer.write_batch(batch)
+        for values in self._buffer.values():
+            values.clear()
+        self._buffered = 0
+
+    def close(self):
+        if self._writer is None:
+            return
+        self._flush()
+        self._writer.close()
+        if self.file_format == "feather":
+            self._sink.close()
+        self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,196 @@
+"""Synthetic DEXA report corpus generator for scale testing.
+
+Writes realistic, entirely synthetic reports in both layouts the parsers
+recognise, as text and/or XPS, so throughput, memory and pairing can be
+tested at production volumes without patient data:
+
+    python benchmarks/corpus.py OUT_DIR --scans 50000 --format both
+
+Each scan gets a numeric prefix. Most scans are written as a pair, a
+standard "BODY COMPOSITION: Total Body (Enhanced Analysis)" report
+(<prefix>_body) plus a "Total Body Custom Results" ROI report (<prefix>_roi);
+the rest are written as one half only, so pairing sees orphans too. A
+fraction of files can be written without a numeric prefix. When both text
+and XPS are requested they go to txt/ and xps/ subdirectories, since copies
+of the same report in one folder would share a prefix. Files are generated
+one at a time, and corpus.json records what was written so a run can be
+checked against it.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+sys.path.insert(0, BENCHMARK_DIR)
+
+from utils import STANDARD_ANCHOR, NUMERIC_ANCHOR, REGION_MAP, POSSIBLE_DEXA_FILE_COLUMNS
+from xps_writer import write_xps, report_pages
+
+# Share of the body's soft tissue and bone in each standard region, and the
+# region's fat relative to the whole-body fat percentage
+STANDARD_REGIONS = {
+    "Arms": (0.11, 0.9),
+    "Legs": (0.34, 0.95),
+    "Trunk": (0.48, 1.1),
+    "Android (e)": (0.07, 1.2),
+    "Gynoid": (0.16, 1.05),
+}
+# Same for the custom ROIs, numbered as in REGION_MAP
+NUMERIC_REGIONS = {
+    "1": (0.09, 1.0),
+    "2": (0.08, 1.25),
+    "3": (0.06, 1.1),
+    "4": (0.07, 0.9),
+}
+
+def _header_lines():
+    lines = []
+    for column in POSSIBLE_DEXA_FILE_COLUMNS:
+        # Exports break column headers at the unit, e.g. "Fat" / "(g)"
+        name, _, unit = column.rpartition(" ")
+        lines.extend([name, unit])
+    return lines
+
+def _region_values(rng, total_tissue, total_bmc, body_fat, share, fat_factor):
+    tissue = total_tissue * share * rng.uniform(0.9, 1.1)
+    bmc = total_bmc * share * rng.uniform(0.8, 1.2)
+    tissue_fat = min(0.75, max(0.03, body_fat * fat_factor * rng.uniform(0.9, 1.1)))
+    fat = tissue * tissue_fat
+    lean = tissue - fat
+    return [
+        f"{100 * tissue_fat:.1f}",
+        f"{100 * fat / (tissue + bmc):.1f}",
+        f"{tissue:,.0f}",
+        f"{fat:,.0f}",
+        f"{lean:,.0f}",
+        f"{bmc:,.0f}",
+        f"{lean + bmc:,.0f}",
+        f"{(tissue + bmc) / 1000:.1f}",
+    ]
+
+def _subject(rng):
+    weight = rng.uniform(45, 140)
+    body_fat = rng.uniform(0.1, 0.5)
+    total_bmc = weight * rng.uniform(0.035, 0.045) * 1000
+    return weight * 1000 - total_bmc, total_bmc, body_fat
+
+def standard_report(rng, patient):
+    """Text of a standard body composition report with a VAT block."""
+    total_tissue, total_bmc, body_fat = _subject(rng)
+    lines = [f"Patient: {patient}", f"Scan date {rng.randint(1, 12):02d}/{rng.randint(1, 28):02d}/2020",
+             STANDARD_ANCHOR]
+    lines += _header_lines()
+    for region, (share, fat_factor) in STANDARD_REGIONS.items():
+        lines.append(region)
+        lines += _region_values(rng, total_tissue, total_bmc, body_fat, share, fat_factor)
+    lines.append("Total")
+    lines += _region_values(rng, total_tissue, total_bmc, body_fat, 1.0, 1.0)
+
+    vat_mass = rng.uniform(100, 2500)
+    lines += [f"Fat Mass Ratios: {rng.uniform(0.6, 1.4):.2f}", "Trunk/Total",
+              f"{rng.uniform(0.3, 0.7):.2f}",
+              "Estimated Visceral Adipose Tissue", "Volume", "Mass", "Area",
+              f"{vat_mass / 0.94:.0f} cm³", f"{vat_mass:.0f} g", f"{vat_mass / 9:.0f} cm²",
+              "Synthetic report, not patient data"]
+    return "\n".join(lines) + "\n"
+
+def numeric_report(rng, patient):
+    """Text of a custom ROI report with ROIs 1-4."""
+    assert set(NUMERIC_REGIONS) == set(REGION_MAP)
+    total_tissue, total_bmc, body_fat = _subject(rng)
+    lines = [f"Patient: {patient}", NUMERIC_ANCHOR]
+    lines += _header_lines()
+    for region, (share, fat_factor) in NUMERIC_REGIONS.items():
+        lines.append(region)
+        lines += _region_values(rng, total_tissue, total_bmc, body_fat, share, fat_factor)
+    lines.append("Synthetic report, not patient data")
+    return "\n".join(lines) + "\n"
+
+def write_report(path_base, text, file_format, patient):
+    if file_format == "txt":
+        with open(path_base + ".txt", 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        write_xps(path_base + ".xps", report_pages(text, patient=patient))
+
+def generate_corpus(output_dir, scans, formats=("txt",), pair_fraction=0.8,
+                    no_prefix_fraction=0.0, seed=0, files_per_dir=0, first_prefix=100000):
+    """Write a synthetic corpus and return a summary of what was written.
+
+    formats holds "txt" and/or "xps"; with both, every report is written in
+    both formats, under output_dir/txt and output_dir/xps. files_per_dir > 0
+    spreads the scans over numbered subdirectories, the way exports are often
+    archived.
+    """
+    rng = random.Random(seed)
+    summary = {"scans": scans, "formats": list(formats), "seed": seed, "files": 0,
+               "pairs": 0, "standard_only": 0, "numeric_only": 0, "no_prefix": 0}
+
+    roots = {file_format: os.path.join(output_dir, file_format) if len(formats) > 1 else output_dir
+             for file_format in formats}
+    for index in range(scans):
+        subdirectory = f"{index // files_per_dir:05d}" if files_per_dir else ""
+        directories = {file_format: os.path.join(root, subdirectory)
+                       for file_format, root in roots.items()}
+        for directory in directories.values():
+            os.makedirs(directory, exist_ok=True)
+
+        patient = f"SYNTHETIC-{index:06d}"
+        if rng.random() < no_prefix_fraction:
+            prefix = f"scan{index:06d}"
+            summary["no_prefix"] += 1
+        else:
+            prefix = str(first_prefix + index)
+
+        roll = rng.random()
+        if roll < pair_fraction:
+            halves = ("body", "roi")
+            summary["pairs"] += 1
+        elif roll < pair_fraction + (1 - pair_fraction) / 2:
+            halves = ("body",)
+            summary["standard_only"] += 1
+        else:
+            halves = ("roi",)
+            summary["numeric_only"] += 1
+
+        for half in halves:
+            text = standard_report(rng, patient) if half == "body" else numeric_report(rng, patient)
+            for file_format, directory in directories.items():
+                write_report(os.path.join(directory, f"{prefix}_{half}"), text, file_format, patient)
+                summary["files"] += 1
+
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, "corpus.json"), 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Write a synthetic DEXA report corpus.")
+    parser.add_argument("output", help="Directory to write the corpus to")
+    parser.add_argument("--scans", type=int, default=1000,
+                        help="Number of scans; paired scans produce two reports (default: %(default)s)")
+    parser.add_argument("--format", choices=("txt", "xps", "both"), default="txt",
+                        help="File format to write (default: %(default)s)")
+    parser.add_argument("--pair-fraction", type=float, default=0.8,
+                        help="Share of scans written as a standard/ROI pair (default: %(default)s)")
+    parser.add_argument("--no-prefix-fraction", type=float, default=0.0,
+                        help="Share of scans written without a numeric prefix (default: %(default)s)")
+    parser.add_argument("--files-per-dir", type=int, default=0,
+                        help="Scans per numbered subdirectory; 0 writes one flat directory")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default: %(default)s)")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    formats = ("txt", "xps") if args.format == "both" else (args.format,)
+    summary = generate_corpus(args.output, args.scans, formats, args.pair_fraction,
+                              args.no_prefix_fraction, args.seed, args.files_per_dir)
+    print(f"Wrote {summary['files']} files for {summary['scans']} scans "
+          f"({summary['pairs']} pairs) to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,228 @@
+"""Benchmark suite for the CHIPS conversion stages.
+
+Times XPS extraction, parsing, merging and CSV generation separately and end
+to end, for both report formats and both study processors, on the fixed
+fixtures in benchmarks/fixtures, plus the time a fresh interpreter takes to
+import the GUI and the command line. Results are printed as a table and can be
+written as JSON and compared against a stored baseline:
+
+    python benchmarks/run.py --output results.json
+    python benchmarks/run.py --save-baseline benchmarks/baseline.json
+    python benchmarks/run.py --baseline benchmarks/baseline.json --threshold 0.5
+
+The exit status is 1 when the fastest round of any benchmark is slower than
+the fastest round in the baseline by more than the threshold. The minimum is
+compared because noise on a busy machine only ever adds time. Baselines are
+machine specific, so they are not committed: record one on the machine the
+comparison runs on.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import timeit
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARK_DIR)
+FIXTURE_DIR = os.path.join(BENCHMARK_DIR, "fixtures")
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, "baseline.json")
+RESULTS_VERSION = 1
+
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, BENCHMARK_DIR)
+
+import cuirass_processor
+import fuvid_processor
+from batch_engine import process_group
+from report_parser import parse_body_composition
+from utils import xps_to_text, xps_report_text, merge_data
+from xps_writer import write_xps, report_pages
+
+PROCESSORS = {"Cuirass": cuirass_processor, "FUVID": fuvid_processor}
+REPORT_FORMATS = ("standard", "numeric")
+
+def read_fixture(report_format):
+    with open(os.path.join(FIXTURE_DIR, f"{report_format}.txt"), 'r', encoding='utf-8') as f:
+        return f.read()
+
+def prepare_inputs(workdir):
+    """Write the text and XPS inputs used by the benchmarks into workdir."""
+    inputs = {}
+    for report_format in REPORT_FORMATS:
+        text = read_fixture(report_format)
+        text_file = os.path.join(workdir, f"100_{report_format}.txt")
+        with open(text_file, 'w', encoding='utf-8') as f:
+            f.write(text)
+        xps_file = os.path.join(workdir, f"100_{report_format}.xps")
+        write_xps(xps_file, report_pages(text, patient="BENCHMARK, FIXTURE"))
+        inputs[report_format] = {"text": text, "txt": text_file, "xps": xps_file}
+    return inputs
+
+def build_benchmarks(inputs, output_dir):
+    """Return the benchmarks as (name, zero-argument callable) pairs."""
+    parsed = {fmt: parse_body_composition(inputs[fmt]["text"]) for fmt in REPORT_FORMATS}
+    merged = merge_data(parsed["standard"], parsed["numeric"])
+    csv_inputs = {"merged": merged, "standard": parsed["standard"]}
+    csv_file = os.path.join(output_dir, "benchmark_output.csv")
+
+    benchmarks = []
+    for fmt in REPORT_FORMATS:
+        xps_file = inputs[fmt]["xps"]
+        benchmarks.append((f"extract.xps_to_text.{fmt}", lambda f=xps_file: xps_to_text(f)))
+        benchmarks.append((f"extract.xps_report_text.{fmt}", lambda f=xps_file: xps_report_text(f)))
+    for fmt in REPORT_FORMATS:
+        text = inputs[fmt]["text"]
+        benchmarks.append((f"parse.{fmt}", lambda t=text: parse_body_composition(t)))
+    benchmarks.append(("merge", lambda: merge_data(parsed["standard"], parsed["numeric"])))
+    for study, processor in PROCESSORS.items():
+        for kind, data in csv_inputs.items():
+            benchmarks.append((f"csv.{study}.{kind}",
+                               lambda p=processor, d=data: p.generate_output_csv(d, csv_file)))
+    for study in PROCESSORS:
+        for source in ("txt", "xps"):
+            pair = [inputs[fmt][source] for fmt in REPORT_FORMATS]
+            benchmarks.append((f"end_to_end.{study}.{source}_pair",
+                               lambda s=study, p=pair: process_group("100", p, output_dir, [s])))
+    for module in ("main", "chips"):
+        benchmarks.append((f"startup.import_{module}", lambda m=module: import_in_subprocess(m)))
+    return benchmarks
+
+def import_in_subprocess(module):
+    subprocess.run([sys.executable, "-c", f"import {module}"], cwd=REPO_DIR, check=True)
+
+def time_benchmark(func, rounds):
+    """Seconds per call: the number of calls per round is calibrated to take at least 0.2 s."""
+    func()  # warm up
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    times = [total / number for total in timer.repeat(repeat=rounds, number=number)]
+    return {
+        "median": statistics.median(times),
+        "min": min(times),
+        "max": max(times),
+        "rounds": rounds,
+        "number": number,
+    }
+
+def environment():
+    info = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+    }
+    try:
+        import fitz
+        info["pymupdf"] = fitz.VersionBind
+    except (ImportError, AttributeError):
+        pass
+    try:
+        import numpy
+        info["numpy"] = numpy.__version__
+    except ImportError:
+        pass
+    try:
+        info["commit"] = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                                        capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        pass
+    return info
+
+def compare(results, baseline, threshold):
+    """Relative change of each minimum against the baseline, and the regressions."""
+    changes = {}
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        change = result["min"] / previous["min"] - 1
+        changes[name] = change
+        if change > threshold:
+            regressions.append(name)
+    return changes, regressions
+
+def format_table(results, changes):
+    width = max(len(name) for name in results)
+    lines = [f"{'benchmark':<{width}}  {'median':>10}  {'min':>10}  {'vs baseline':>11}"]
+    for name, result in results.items():
+        change = f"{changes[name]:+.1%}" if name in changes else "-"
+        lines.append(f"{name:<{width}}  {result['median'] * 1000:>8.3f}ms  "
+                     f"{result['min'] * 1000:>8.3f}ms  {change:>11}")
+    return "\n".join(lines)
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmark the CHIPS conversion stages.")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--baseline", default=None,
+                        help="Baseline JSON to compare against (default: benchmarks/baseline.json "
+                             "if it exists)")
+    parser.add_argument("--save-baseline", metavar="PATH",
+                        help="Write the results as the new baseline to PATH")
+    parser.add_argument("--threshold", type=float, default=0.5,
+                        help="Relative slowdown of the fastest round that counts as a "
+                             "regression (default: %(default)s)")
+    parser.add_argument("--rounds", type=int, default=9, help="Timed rounds per benchmark "
+                        "(default: %(default)s)")
+    parser.add_argument("-k", "--filter", default=None,
+                        help="Only run benchmarks whose name contains this text")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    baseline_file = args.baseline or (DEFAULT_BASELINE if os.path.exists(DEFAULT_BASELINE) else None)
+    baseline = None
+    if baseline_file:
+        with open(baseline_file, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    changes, regressions = {}, []
+    with tempfile.TemporaryDirectory() as workdir:
+        output_dir = os.path.join(workdir, "output")
+        os.makedirs(output_dir)
+        benchmarks = build_benchmarks(prepare_inputs(workdir), output_dir)
+        if args.filter:
+            benchmarks = [(name, func) for name, func in benchmarks if args.filter in name]
+        if not benchmarks:
+            print("Error: no benchmarks selected", file=sys.stderr)
+            return 2
+        results = {name: time_benchmark(func, args.rounds) for name, func in benchmarks}
+        if baseline:
+            changes, regressions = compare(results, baseline["results"], args.threshold)
+            # Time apparent regressions again, so that one noisy stretch is not reported
+            for name, func in benchmarks:
+                if name in regressions:
+                    retimed = time_benchmark(func, args.rounds)
+                    if retimed["min"] < results[name]["min"]:
+                        results[name] = retimed
+            if regressions:
+                changes, regressions = compare(results, baseline["results"], args.threshold)
+
+    report = {"version": RESULTS_VERSION, "environment": environment(), "results": results}
+    if baseline:
+        report["baseline"] = {"file": baseline_file, "environment": baseline.get("environment"),
+                              "changes": changes, "regressions": regressions}
+
+    print(format_table(results, changes))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            json.dump({key: report[key] for key in ("version", "environment", "results")}, f, indent=2)
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}: "
+              + ", ".join(regressions), file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
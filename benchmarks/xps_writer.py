@@ -0,0 +1,88 @@
+"""Minimal XPS writer for benchmark and test fixtures.
+
+Writes one Glyphs element per text line, which MuPDF extracts back as the
+same lines. The bundled DejaVu Sans Mono subset covers printable ASCII plus
+the superscripts and symbols used in DEXA reports. Archive timestamps are
+fixed, so the same pages always produce the same bytes.
+"""
+import os
+import zipfile
+from xml.sax.saxutils import quoteattr
+
+FONT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures",
+                         "DejaVuSansMono-subset.ttf")
+
+_FIXED_DATE = (2020, 1, 1, 0, 0, 0)
+_LINE_HEIGHT = 14
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="utf-8"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="fdseq" ContentType="application/vnd.ms-package.xps-fixeddocumentsequence+xml"/>'
+    '<Default Extension="fdoc" ContentType="application/vnd.ms-package.xps-fixeddocument+xml"/>'
+    '<Default Extension="fpage" ContentType="application/vnd.ms-package.xps-fixedpage+xml"/>'
+    '<Default Extension="ttf" ContentType="application/vnd.ms-opentype"/>'
+    '</Types>'
+)
+_RELS = (
+    '<?xml version="1.0" encoding="utf-8"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Type="http://schemas.microsoft.com/xps/2005/06/fixedrepresentation" '
+    'Target="/FixedDocSeq.fdseq" Id="R0"/>'
+    '</Relationships>'
+)
+_DOC_SEQUENCE = (
+    '<FixedDocumentSequence xmlns="http://schemas.microsoft.com/xps/2005/06">'
+    '<DocumentReference Source="/Documents/1/FixedDoc.fdoc"/>'
+    '</FixedDocumentSequence>'
+)
+
+def _glyphs(line, index):
+    # A leading "{" would be read as an XPS markup escape
+    text = "{}" + line if line.startswith("{") else line
+    return (f'<Glyphs FontUri="/Resources/font.ttf" FontRenderingEmSize="10" OriginX="20" '
+            f'OriginY="{20 + _LINE_HEIGHT * index}" Fill="#FF000000" UnicodeString={quoteattr(text)}/>')
+
+def page_xml(lines):
+    body = "".join(_glyphs(line, index) for index, line in enumerate(lines) if line)
+    height = max(1056, 40 + _LINE_HEIGHT * len(lines))
+    return (f'<FixedPage xmlns="http://schemas.microsoft.com/xps/2005/06" Width="816" '
+            f'Height="{height}">{body}</FixedPage>')
+
+def report_pages(text, patient="FIXTURE", trailing_pages=3):
+    """Lay a report out the way scanner exports are: cover, report, trailing pages."""
+    cover = ["DEXA Scan Report", f"Patient: {patient}", "Scan date 01/01/2020"]
+    trailing = [f"Reference curve point {i}: {i * 0.1:.1f}" for i in range(60)]
+    return [cover, text.split("\n")] + [trailing] * trailing_pages
+
+_font = None
+
+def _font_data():
+    global _font
+    if _font is None:
+        with open(FONT_FILE, 'rb') as f:
+            _font = f.read()
+    return _font
+
+def write_xps(path, pages):
+    """Write an XPS document with one page per list of text lines."""
+    font = _font_data()
+
+    def add(archive, name, data):
+        info = zipfile.ZipInfo(name, date_time=_FIXED_DATE)
+        info.compress_type = zipfile.ZIP_DEFLATED
+        archive.writestr(info, data)
+
+    with zipfile.ZipFile(path, 'w') as archive:
+        add(archive, "[Content_Types].xml", _CONTENT_TYPES)
+        add(archive, "_rels/.rels", _RELS)
+        add(archive, "FixedDocSeq.fdseq", _DOC_SEQUENCE)
+        add(archive, "Documents/1/FixedDoc.fdoc",
+            '<FixedDocument xmlns="http://schemas.microsoft.com/xps/2005/06">'
+            + "".join(f'<PageContent Source="/Documents/1/Pages/{i + 1}.fpage"/>'
+                      for i in range(len(pages)))
+            + '</FixedDocument>')
+        add(archive, "Resources/font.ttf", font)
+        for i, lines in enumerate(pages):
+            add(archive, f"Documents/1/Pages/{i + 1}.fpage", page_xml(lines))
@@ -0,0 +1,235 @@
+"""Headless command-line batch mode for CHIPS.
+
+Usage:
+    python -m chips INPUT [INPUT ...] --study Cuirass [--study FUVID] --output OUT_DIR [--workers N]
+    python -m chips INPUT_DIR --watch --study Cuirass --output OUT_DIR
+
+Inputs may be files or directories. This module must never import PyQt6 so
+that it can run on machines without a display (cron jobs, containers).
+"""
+import argparse
+import os
+import signal
+import sys
+
+from batch_engine import (run_batch, default_worker_count, BACKENDS, DEFAULT_BACKEND, STUDY_TYPES,
+                          iter_input_files, BatchControl)
+from batch_output import COLUMNAR_FORMATS
+from chips_logging import configure_logging
+from timing import format_timing_summary
+from progress import format_progress, format_throughput
+from extraction_cache import ExtractionCache, DEFAULT_MAX_BYTES
+from watcher import FolderWatcher, DEFAULT_SETTLE_TIME, DEFAULT_PAIR_TIMEOUT, DEFAULT_POLL_INTERVAL
+
+def collect_input_files(paths, recursive=False):
+    """Expand the given files and directories into a list of input files."""
+    files = []
+    seen = set()
+
+    def add(path):
+        if path not in seen:
+            seen.add(path)
+            files.append(path)
+
+    for path in paths:
+        if os.path.isdir(path):
+            for file in iter_input_files(path, recursive):
+                add(file)
+        elif os.path.isfile(path):
+            add(path)
+        else:
+            print(f"Warning: skipping missing input {path}", file=sys.stderr)
+    return files
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="chips",
+        description="Convert DEXA scan reports (XPS/TXT) to CSV without the GUI."
+    )
+    parser.add_argument("inputs", nargs="+", help="Input files or directories")
+    parser.add_argument("-s", "--study", choices=STUDY_TYPES, action="append", required=True,
+                        help="Study type used to build the output; repeat to write several "
+                             "studies from one pass (each goes to its own subdirectory)")
+    parser.add_argument("-o", "--output", required=True, help="Output directory")
+    parser.add_argument("-j", "--workers", type=int, default=default_worker_count(),
+                        help="Number of worker processes (default: CPU count)")
+    parser.add_argument("--backend", choices=BACKENDS, default=DEFAULT_BACKEND,
+                        help="Worker pool backend (default: %(default)s)")
+    parser.add_argument("-r", "--recursive", action="store_true",
+                        help="Search input directories recursively")
+    parser.add_argument("--combined", action="store_true",
+                        help="Also stream all rows into one <study>_combined_output.csv")
+    parser.add_argument("--columnar", choices=tuple(COLUMNAR_FORMATS), default=None,
+                        help="Also write all rows with typed columns to "
+                             "<study>_combined_output.<format> (requires pyarrow)")
+    parser.add_argument("--no-per-file", action="store_true",
+                        help="Do not write one CSV per scan (requires --combined or --columnar)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Skip inputs that are unchanged since they were last converted "
+                             "into the output directory (per-file output only)")
+    parser.add_argument("--no-pair-across-batches", action="store_true",
+                        help="Do not merge a half of a pair with its partner from an earlier "
+                             "batch into the same output directory, and do not store halves "
+                             "for later batches (the watch mode always pairs across batches)")
+    parser.add_argument("--progress", action="store_true",
+                        help="Print progress with throughput and ETA to stderr while converting")
+    parser.add_argument("--timing", action="store_true",
+                        help="Print per-stage timings after the summary (always written to "
+                             "chips_timing.json in the output directory)")
+    parser.add_argument("--multi-report-xps", action="store_true",
+                        help="Read XPS exports to the end and convert every report in them "
+                             "(text exports are always split into their reports)")
+    parser.add_argument("--watch", action="store_true",
+                        help="Keep running and convert files as they appear in the input "
+                             "directory (per-file output only)")
+    parser.add_argument("--settle-seconds", type=float, default=DEFAULT_SETTLE_TIME,
+                        help="Watch mode: seconds a file must stay unchanged before it is "
+                             "converted (default: %(default)s)")
+    parser.add_argument("--pair-timeout", type=float, default=DEFAULT_PAIR_TIMEOUT,
+                        help="Watch mode: seconds to wait for the partner of a prefix pair "
+                             "(default: %(default)s)")
+    parser.add_argument("--poll-interval", type=float, default=DEFAULT_POLL_INTERVAL,
+                        help="Watch mode: seconds between checks (default: %(default)s)")
+    parser.add_argument("--no-inotify", action="store_true",
+                        help="Watch mode: always poll, even where inotify is available")
+    parser.add_argument("--log-level", default="WARNING",
+                        choices=("DEBUG", "INFO", "WARNING", "ERROR"),
+                        help="Console log level (default: %(default)s); failed files also "
+                             "get a trace of their INFO records and per-line DEBUG detail")
+    parser.add_argument("--log-format", choices=("text", "json"), default="text",
+                        help="Console log format (default: %(default)s)")
+    parser.add_argument("--cache-dir", default=None,
+                        help="Extraction cache directory (default: CHIPS_CACHE_DIR or the user cache)")
+    parser.add_argument("--cache-max-mb", type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                        help="Extraction cache size cap in MB (default: %(default)s)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Always extract XPS files, bypassing the cache")
+    return parser
+
+def print_result(prefix, files, counts):
+    names = " + ".join(os.path.basename(f) for f in files)
+    if counts['skipped']:
+        print(f"Up to date: {names}", flush=True)
+    elif counts['errors']:
+        print(f"Failed: {names}", flush=True)
+    else:
+        merged = counts['merged'] or counts['merged_with_earlier']
+        print(f"{'Merged' if merged else 'Converted'}: {names}", flush=True)
+
+def watch(args, studies, cache):
+    """Run the folder watcher until interrupted."""
+    watcher = FolderWatcher(args.inputs[0], args.output, studies, cache=cache,
+                            settle_time=args.settle_seconds, pair_timeout=args.pair_timeout,
+                            poll_interval=args.poll_interval, use_inotify=not args.no_inotify,
+                            on_result=print_result, multi_report_xps=args.multi_report_xps)
+    print(f"Watching {args.inputs[0]} (Ctrl+C to stop)", flush=True)
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+def install_interrupt_handler(control):
+    """First Ctrl+C cancels the batch after the files in progress, the second aborts them."""
+    def handle_interrupt(signum, frame):
+        if control.cancelled:
+            print("Aborting files in progress...", file=sys.stderr, flush=True)
+            control.cancel(abort=True)
+        else:
+            print("Cancelling after the files in progress (Ctrl+C again to abort)...",
+                  file=sys.stderr, flush=True)
+            control.cancel()
+    return signal.signal(signal.SIGINT, handle_interrupt)
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    configure_logging(args.log_level, json_format=args.log_format == "json")
+
+    if args.workers < 1:
+        print("Error: --workers must be at least 1", file=sys.stderr)
+        return 2
+
+    if args.no_per_file and not (args.combined or args.columnar):
+        print("Error: --no-per-file requires --combined or --columnar", file=sys.stderr)
+        return 2
+
+    if args.incremental and (args.combined or args.columnar):
+        print("Error: --incremental cannot be combined with --combined or --columnar",
+              file=sys.stderr)
+        return 2
+
+    if args.watch:
+        if len(args.inputs) != 1 or not os.path.isdir(args.inputs[0]):
+            print("Error: --watch takes exactly one input directory", file=sys.stderr)
+            return 2
+        if args.combined or args.columnar or args.no_per_file:
+            print("Error: --watch only writes per-file output", file=sys.stderr)
+            return 2
+
+    files = []
+    if not args.watch:
+        files = collect_input_files(args.inputs, recursive=args.recursive)
+        if not files:
+            print("Error: no input files found", file=sys.stderr)
+            return 2
+
+    os.makedirs(args.output, exist_ok=True)
+
+    cache = None
+    if not args.no_cache:
+        cache = ExtractionCache(args.cache_dir, max_bytes=args.cache_max_mb * 1024 * 1024)
+
+    studies = list(dict.fromkeys(args.study))
+    if args.watch:
+        return watch(args, studies, cache)
+
+    last_progress = {}
+
+    def report_progress(snapshot):
+        last_progress.update(snapshot)
+        if args.progress:
+            # Redraw one line on a terminal, one line per update otherwise
+            end = "\r" if sys.stderr.isatty() else "\n"
+            print(format_progress(snapshot), end=end, file=sys.stderr, flush=True)
+
+    control = BatchControl()
+    previous_handler = install_interrupt_handler(control)
+    try:
+        results = run_batch(files, args.output, studies,
+                            max_workers=args.workers, backend=args.backend,
+                            on_progress=report_progress, cache=cache,
+                            per_file_output=not args.no_per_file, combined_output=args.combined,
+                            columnar_format=args.columnar, incremental=args.incremental,
+                            control=control, multi_report_xps=args.multi_report_xps,
+                            pair_across_batches=not args.no_pair_across_batches)
+    finally:
+        signal.signal(signal.SIGINT, previous_handler)
+        if args.progress and sys.stderr.isatty():
+            print(file=sys.stderr)
+
+    if results['cancelled'] > 0:
+        print(f"Conversion cancelled: {results['cancelled']} files were not converted")
+    else:
+        print("Conversion complete!")
+    if results['merged'] > 0:
+        print(f"Successfully merged: {results['merged']} pairs ({results['merged'] * 2} files)")
+    if results['merged_with_earlier'] > 0:
+        print(f"Merged with a file from an earlier batch: {results['merged_with_earlier']} files")
+    print(f"Successfully processed: {results['success']} files")
+    if results['skipped'] > 0:
+        print(f"Skipped (up to date): {results['skipped']} files")
+    if results['errors'] > 0:
+        print(f"Errors encountered: {results['errors']} files")
+    if last_progress:
+        print(format_throughput(last_progress))
+    if args.timing:
+        for line in format_timing_summary(results['timing']):
+            print(line)
+    if results['cancelled'] > 0:
+        return 130
+    if results['errors'] > 0:
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,181 @@
+"""Leveled, buffered logging for CHIPS.
+
+All modules log to children of the "chips" logger. Records at or above the
+console level are always written to the console. While a file is being
+processed (inside file_trace), the records below that level are kept in an
+in-memory ring buffer, which is written to the console only if the file
+fails, so a failure comes with the context that led up to it.
+
+Per-line detail goes through trace_debug() rather than Logger.debug: building
+a record for every parsed line costs several times more than parsing it, so
+trace_debug() only keeps the message and its arguments, and they are turned
+into a record if the file fails. Failed files therefore come with their
+per-line trace at any console level.
+"""
+import collections
+import contextlib
+import json
+import logging
+import sys
+import threading
+import time
+
+ROOT_LOGGER = "chips"
+TRACE_CAPACITY = 500
+TRACE_LEVEL = logging.INFO
+
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s [%(source_file)s] %(message)s"
+
+class _ThreadState(threading.local):
+    trace = None  # A class default, as a missing attribute is slow to look up
+
+_state = _ThreadState()
+_config = {"level": "WARNING", "json_format": False}
+
+def get_logger(name):
+    """Logger for a CHIPS module, e.g. get_logger("parser") -> "chips.parser"."""
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+def _current_trace():
+    return _state.trace
+
+def trace_debug(logger, msg, *args):
+    """Log a DEBUG message for the current file's trace without building a record.
+
+    The message is written straight away when the console level is DEBUG.
+    Otherwise it is kept, unformatted, in the trace of the file being
+    processed, and dropped if the file converts.
+    """
+    if _console_debug:
+        logger.debug(msg, *args)
+        return
+    trace = _state.trace
+    if trace is not None:
+        trace.records.append((time.time(), logger.name, msg, args))
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, for machine-readable logs."""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "file": record.source_file,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+class _SourceFileFilter(logging.Filter):
+    """Tags every record with the file being processed by the current thread."""
+
+    def filter(self, record):
+        if not hasattr(record, "source_file"):
+            trace = _current_trace()
+            record.source_file = trace.source_file if trace else ""
+        return True
+
+class _TraceBufferHandler(logging.Handler):
+    """Buffers the records that the console level would drop."""
+
+    def emit(self, record):
+        trace = _current_trace()
+        if trace is None:
+            return
+        if _console_handler is None or record.levelno < _console_handler.level:
+            trace.records.append(record)
+
+class FileTrace:
+    """Ring buffer of what was logged below the console level while processing one file.
+
+    Entries are LogRecords, or (time, logger name, message, args) tuples
+    from trace_debug().
+    """
+
+    def __init__(self, source_file, capacity=TRACE_CAPACITY):
+        self.source_file = source_file
+        self.records = collections.deque(maxlen=capacity)
+        self.failed = False
+
+    def fail(self):
+        """Mark the file as failed; its trace is written out when the trace ends."""
+        self.failed = True
+
+    def dump(self):
+        if not self.records:
+            return
+        header = logging.LogRecord(
+            ROOT_LOGGER, logging.ERROR, __file__, 0,
+            "Processing failed, trace of the last %d records below the console level follows",
+            (len(self.records),), None
+        )
+        header.source_file = self.source_file
+        for entry in [header, *self.records]:
+            record = entry if isinstance(entry, logging.LogRecord) else self._to_record(entry)
+            # Handler.handle skips the level check, so the buffered
+            # records are written out although they are below it.
+            _console_handler.handle(record)
+
+    def _to_record(self, entry):
+        created, name, msg, args = entry
+        record = logging.LogRecord(name, logging.DEBUG, __file__, 0, msg, args, None)
+        record.created = created
+        record.msecs = (created - int(created)) * 1000
+        record.source_file = self.source_file
+        return record
+
+@contextlib.contextmanager
+def file_trace(source_file, capacity=TRACE_CAPACITY):
+    """Buffer the current thread's log records while processing source_file.
+
+    The buffer is written to the console if the block raises or calls
+    trace.fail(); otherwise it is discarded.
+    """
+    previous = _current_trace()
+    trace = FileTrace(source_file, capacity)
+    _state.trace = trace
+    try:
+        yield trace
+    except BaseException:
+        trace.failed = True
+        raise
+    finally:
+        _state.trace = previous
+        if trace.failed:
+            trace.dump()
+
+_root = logging.getLogger(ROOT_LOGGER)
+_root.propagate = False
+_trace_handler = _TraceBufferHandler()
+_trace_handler.addFilter(_SourceFileFilter())
+_root.addHandler(_trace_handler)
+_console_handler = None
+_console_debug = False
+
+def configure_logging(level="WARNING", json_format=False, stream=None):
+    """Set up console output.
+
+    Records at or above level are written as they are logged. Traces of
+    failed files add the INFO records and trace_debug() messages below it.
+    """
+    global _console_handler, _console_debug
+    _config.update(level=level, json_format=json_format)
+    if _console_handler is not None:
+        _root.removeHandler(_console_handler)
+
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setLevel(level)
+    _root.setLevel(min(handler.level, TRACE_LEVEL))
+    handler.setFormatter(JsonFormatter() if json_format else logging.Formatter(TEXT_FORMAT))
+    handler.addFilter(_SourceFileFilter())
+    _root.addHandler(handler)
+    _console_handler = handler
+    _console_debug = handler.level <= logging.DEBUG
+
+def logging_config():
+    """Current configure_logging arguments, e.g. to pass to worker processes."""
+    return (_config["level"], _config["json_format"])
+
+configure_logging()
@@ -1,189 +1,159 @@
 import csv
-import re
-from utils import str_to_float, POSSIBLE_DEXA_FILE_COLUMNS, REGION_MAP
+from chips_logging import get_logger, trace_debug
+from report_parser import parse_body_composition
+from formulas import FormulaEngine
 
+log = get_logger("cuirass")
+
+# Derived columns: output column -> (input columns, formula over float arrays, decimals).
+# Formulas may read other derived columns; FORMULA_ENGINE works out the order.
 COLUMN_FORMULAS = {
-    "ASMM kg": lambda data: str(round(float(data["Total Lean Arms kg"]) + float(data["Total Lean Legs kg"]), 3)),
-    "Trunk Fat Perc BodyFat": lambda data: str(round(100 * float(data["Trunk Fat kg"]) / float(data["Total Fat kg"]), 2)),
-    "Android Fat Perc BodyFat": lambda data: str(round(100 * float(data["Android Fat kg"]) / float(data["Total Fat kg"]), 2)),
-    "Gynoid Fat Perc BodyFat": lambda data: str(round(100 * float(data["Gynoid Fat kg"]) / float(data["Total Fat kg"]), 2)),
-    "ROI Rib Fat Perc BodyFat": lambda data: str(round(100 * float(data["ROI Rib Fat kg"]) / float(data["Total Fat kg"]), 2)),
-    "ROI Abdomen Fat Perc BodyFat": lambda data: str(round(100 * float(data["ROI Abdomen Fat kg"]) / float(data["Total Fat kg"]), 1)),
-    "Calc Subcutaneous Fat of Android Region kg": lambda data: str(round(float(data["Android Fat kg"]) - float(data["Visceral Fat Of Android Region kg"]), 3)),
-    "ROI Chest Wall Fat Perc RegionFat": lambda data: str(round(100 * (float(data["ROI Rib Fat kg"]) + float(data["ROI Abdomen Fat kg"])) / (float(data["ROI Total Rib Mass kg"]) + float(data["ROI Total Abdomen Mass kg"])), 1)),
-    "ROI Chest Wall Fat kg": lambda data: str(round(float(data["ROI Rib Fat kg"]) + float(data["ROI Abdomen Fat kg"]), 3)),
-    "ROI Chest Wall Lean kg": lambda data: str(round(float(data["ROI Rib Lean kg"]) + float(data["ROI Abdomen Lean kg"]), 3)),
-    "ROI Chest Wall Total Mass kg": lambda data: str(round(float(data["ROI Total Rib Mass kg"]) + float(data["ROI Total Abdomen Mass kg"]), 3)),
-    "ROI Chest Wall FFM kg": lambda data: str(round(float(data["ROI Rib FFM kg"]) + float(data["ROI Abdomen FFM kg"]), 3)),
-    "ROI Chest Wall Fat Perc BodyFat": lambda data: str(round(100 * float(data["ROI Chest Wall Fat kg"]) / float(data["Total Fat kg"]), 2)),
+    "ASMM kg": (("Total Lean Arms kg", "Total Lean Legs kg"), lambda arms, legs: arms + legs, 3),
+    "Trunk Fat Perc BodyFat": (("Trunk Fat kg", "Total Fat kg"), lambda fat, total: 100 * fat / total, 2),
+    "Android Fat Perc BodyFat": (("Android Fat kg", "Total Fat kg"), lambda fat, total: 100 * fat / total, 2),
+    "Gynoid Fat Perc BodyFat": (("Gynoid Fat kg", "Total Fat kg"), lambda fat, total: 100 * fat / total, 2),
+    "ROI Rib Fat Perc BodyFat": (("ROI Rib Fat kg", "Total Fat kg"), lambda fat, total: 100 * fat / total, 2),
+    "ROI Abdomen Fat Perc BodyFat": (("ROI Abdomen Fat kg", "Total Fat kg"), lambda fat, total: 100 * fat / total, 1),
+    "Calc Subcutaneous Fat of Android Region kg": (("Android Fat kg", "Visceral Fat Of Android Region kg"), lambda fat, vat: fat - vat, 3),
+    "ROI Chest Wall Fat Perc RegionFat": (("ROI Rib Fat kg", "ROI Abdomen Fat kg", "ROI Total Rib Mass kg", "ROI Total Abdomen Mass kg"), lambda rib_fat, abdomen_fat, rib_mass, abdomen_mass: 100 * (rib_fat + abdomen_fat) / (rib_mass + abdomen_mass), 1),
+    "ROI Chest Wall Fat kg": (("ROI Rib Fat kg", "ROI Abdomen Fat kg"), lambda rib, abdomen: rib + abdomen, 3),
+    "ROI Chest Wall Lean kg": (("ROI Rib Lean kg", "ROI Abdomen Lean kg"), lambda rib, abdomen: rib + abdomen, 3),
+    "ROI Chest Wall Total Mass kg": (("ROI Total Rib Mass kg", "ROI Total Abdomen Mass kg"), lambda rib, abdomen: rib + abdomen, 3),
+    "ROI Chest Wall FFM kg": (("ROI Rib FFM kg", "ROI Abdomen FFM kg"), lambda rib, abdomen: rib + abdomen, 3),
+    "ROI Chest Wall Fat Perc BodyFat": (("ROI Chest Wall Fat kg", "Total Fat kg"), lambda fat, total: 100 * fat / total, 2),
 }
 
-def parse_body_composition(content):
-    print("Starting to parse the file content...")
-    
-    # Check for both possible starting points
-    standard_start = content.find("BODY COMPOSITION: Total Body (Enhanced Analysis)")
-    numeric_start = content.find("Total Body Custom Results")
-    
-    if standard_start != -1:
-        content = content[standard_start:]
-        print("Found standard format starting point")
-    elif numeric_start != -1:
-        content = content[numeric_start:]
-        print("Found numeric format starting point")
-    else:
-        print("Error: Could not find either starting point in the file.")
-        return None
-    
-    def find_column_index(col):
-        # Remove whitespace and newlines for comparison
-        clean_content = ''.join(content.split())
-        clean_col = ''.join(col.split())
-        return clean_content.index(clean_col) if clean_col in clean_content else float('inf')
-    
-    # Reorder columns based on their appearance in the content
-    columns = sorted(POSSIBLE_DEXA_FILE_COLUMNS, key=find_column_index)
-    
-    data = {}
-    lines = content.split('\n')
-    current_region = None
-    current_values = []
-    using_numeric = numeric_start != -1
-    
-    print(f"\nParsing lines (Format: {'Numeric' if using_numeric else 'Descriptive'}):")
-    for line in lines[1:]:  # Skip the header line
-        line = line.strip()
-        if not line or line.startswith("Fat Mass Ratios:"):
-            continue
-        
-        print(f"Processing line: {line}")
-        
-        # Check if this line is a new region
-        if not any(char.isdigit() for char in line) or (using_numeric and line in REGION_MAP.keys()):
-            if current_region and len(current_values) == 8:
-                region_key = current_region
-                if using_numeric and current_region in REGION_MAP:
-                    region_key = REGION_MAP[current_region]
-                data[region_key] = dict(zip(columns, current_values))
-                print(f"Stored data for region: {region_key}")
-                print(f"Data: {data[region_key]}")
-            current_region = line.replace('(e)', '').strip()
-            current_values = []
-        else:
-            # This line contains numeric data
-            values = re.findall(r'[-\d,.]+', line)
-            current_values.extend(values)
-    
-    # Store the last region if it's complete
-    if current_region and len(current_values) == len(columns):
-        region_key = current_region
-        if using_numeric and current_region in REGION_MAP:
-            region_key = REGION_MAP[current_region]
-        data[region_key] = dict(zip(columns, current_values))
-        print(f"Stored final data for region: {region_key}")
-        print(f"Data: {data[region_key]}")
-    
-    # Extract Visceral Adipose Tissue Mass if present
-    vat_match = re.search(r"Estimated Visceral Adipose Tissue\s+Volume\s+Mass\s+Area\s+\d+ cm³\s+(\d+) g", content)
-    if vat_match:
-        data["Visceral Fat"] = {"Mass (g)": vat_match.group(1)}
-        print(f"Extracted Visceral Fat Mass: {data['Visceral Fat']['Mass (g)']} g")
-    
-    if not data:
-        print("Error: No data was parsed from the file.")
-        return None
-
-    print(f"\nParsed data structure: {data}")
-    for region, values in data.items():
-        print(f"{region}:")
-        for key, value in values.items():
-            print(f"  {key}: {value}")
-
-    data["_format"] = "numeric" if using_numeric else "standard"
-    return data
+FORMULA_ENGINE = FormulaEngine(COLUMN_FORMULAS)
 
-def generate_output_csv(data, output_file):
-    output_columns = [
-        "Total Fat PercBodyWeight", "Total Fat kg", "Total Lean kg", "Total BMC kg", "DEXA Weight kg",
-        "Total FFM kg", "Total Lean Arms kg", "Total Lean Legs kg", "ASMM kg", "Trunk Fat Perc RegionFat",
-        "Trunk Fat kg", "Trunk Lean kg", "Total Trunk Mass kg", "Trunk FFM kg", "Trunk Fat Perc BodyFat",
-        "Android Fat Perc RegionFat", "Android Fat kg", "Android Lean kg", "Total Android Mass kg",
-        "Android FFM kg", "Android Fat Perc BodyFat", "Gynoid Fat Perc RegionFat", "Gynoid Fat kg",
-        "Gynoid Lean kg", "Total Gynoid Mass kg", "Gynoid FFM kg", "Gynoid Fat Perc BodyFat",
-        "ROI Rib Fat Perc RegionFat", "ROI Rib Fat kg", "ROI Rib Lean kg", "ROI Total Rib Mass kg",
-        "ROI Rib FFM kg", "ROI Rib Fat Perc BodyFat", "ROI Abdomen Fat Perc RegionFat",
-        "ROI Abdomen Fat kg", "ROI Abdomen Lean kg", "ROI Total Abdomen Mass kg", "ROI Abdomen FFM kg",
-        "ROI Abdomen Fat Perc BodyFat", "ROI Chest Wall Fat Perc RegionFat", "ROI Chest Wall Fat kg",
-        "ROI Chest Wall Lean kg", "ROI Chest Wall Total Mass kg", "ROI Chest Wall FFM kg",
-        "ROI Chest Wall Fat Perc BodyFat", "Visceral Fat Of Android Region kg",
-        "Calc Subcutaneous Fat of Android Region kg", "FMI (kg/m2)", "FFMI (kg/m2)", "LMI (kg/m2)",
-        "ASMI (kg/m2)", "ASM-to-Wt Ratio", "FMI / LMI", "LMI / FMI", "LMI / BMI"
-    ]
-
-    output_data = {col: "" for col in output_columns}  # Initialize all fields as blank
+OUTPUT_COLUMNS = [
+    "Total Fat PercBodyWeight", "Total Fat kg", "Total Lean kg", "Total BMC kg", "DEXA Weight kg",
+    "Total FFM kg", "Total Lean Arms kg", "Total Lean Legs kg", "ASMM kg", "Trunk Fat Perc RegionFat",
+    "Trunk Fat kg", "Trunk Lean kg", "Total Trunk Mass kg", "Trunk FFM kg", "Trunk Fat Perc BodyFat",
+    "Android Fat Perc RegionFat", "Android Fat kg", "Android Lean kg", "Total Android Mass kg",
+    "Android FFM kg", "Android Fat Perc BodyFat", "Gynoid Fat Perc RegionFat", "Gynoid Fat kg",
+    "Gynoid Lean kg", "Total Gynoid Mass kg", "Gynoid FFM kg", "Gynoid Fat Perc BodyFat",
+    "ROI Rib Fat Perc RegionFat", "ROI Rib Fat kg", "ROI Rib Lean kg", "ROI Total Rib Mass kg",
+    "ROI Rib FFM kg", "ROI Rib Fat Perc BodyFat", "ROI Abdomen Fat Perc RegionFat",
+    "ROI Abdomen Fat kg", "ROI Abdomen Lean kg", "ROI Total Abdomen Mass kg", "ROI Abdomen FFM kg",
+    "ROI Abdomen Fat Perc BodyFat", "ROI Chest Wall Fat Perc RegionFat", "ROI Chest Wall Fat kg",
+    "ROI Chest Wall Lean kg", "ROI Chest Wall Total Mass kg", "ROI Chest Wall FFM kg",
+    "ROI Chest Wall Fat Perc BodyFat", "Visceral Fat Of Android Region kg",
+    "Calc Subcutaneous Fat of Android Region kg", "FMI (kg/m2)", "FFMI (kg/m2)", "LMI (kg/m2)",
+    "ASMI (kg/m2)", "ASM-to-Wt Ratio", "FMI / LMI", "LMI / FMI", "LMI / BMI"
+]
+
+# Columns printed with a fixed number of decimals; the others are printed as str(value)
+FIXED_DECIMALS = dict.fromkeys((
+    "Total Fat PercBodyWeight",
+    "Trunk Fat Perc RegionFat",
+    "Android Fat Perc RegionFat",
+    "Gynoid Fat Perc RegionFat",
+    "ROI Rib Fat Perc RegionFat",
+    "ROI Abdomen Fat Perc RegionFat",
+), 2)
+
+def build_output_values(data):
+    """Build the typed output values for one ParsedScan.
+
+    Values are floats, rounded as they are printed, except the mass columns
+    copied from the report as text. Columns without a value are left out.
+    The derived columns are added by apply_formulas.
+    """
+    values = {}
 
     # Process standard regions first
-    for region, values in data.items():
-        if region == "Total":
-            output_data["Total Fat PercBodyWeight"] = f"{float(values['Region (%Fat)']):.2f}"
-            output_data["Total Fat kg"] = str(round(str_to_float(values["Fat (g)"]) / 1000, 3))
-            output_data["Total Lean kg"] = str(round(str_to_float(values["Lean (g)"]) / 1000, 3))
-            output_data["Total BMC kg"] = str(round(str_to_float(values["BMC (g)"]) / 1000, 3))
-            output_data["DEXA Weight kg"] = values["Total Mass (kg)"]
-            output_data["Total FFM kg"] = str(round(str_to_float(values["Fat Free (g)"]) / 1000, 3))
-        elif region == "Arms":
-            output_data["Total Lean Arms kg"] = str(round(str_to_float(values["Lean (g)"]) / 1000, 3))
-        elif region == "Legs":
-            output_data["Total Lean Legs kg"] = str(round(str_to_float(values["Lean (g)"]) / 1000, 3))
-        elif region == "Trunk":
-            output_data["Trunk Fat Perc RegionFat"] = f"{float(values['Region (%Fat)']):.2f}"
-            output_data["Trunk Fat kg"] = str(round(str_to_float(values["Fat (g)"]) / 1000, 3))
-            output_data["Trunk Lean kg"] = str(round(str_to_float(values["Lean (g)"]) / 1000, 3))
-            output_data["Total Trunk Mass kg"] = values["Total Mass (kg)"]
-            output_data["Trunk FFM kg"] = str(round(str_to_float(values["Fat Free (g)"]) / 1000, 3))
-        elif region == "Android":
-            output_data["Android Fat Perc RegionFat"] = f"{float(values['Region (%Fat)']):.2f}"
-            output_data["Android Fat kg"] = str(round(str_to_float(values["Fat (g)"]) / 1000, 3))
-            output_data["Android Lean kg"] = str(round(str_to_float(values["Lean (g)"]) / 1000, 3))
-            output_data["Total Android Mass kg"] = values["Total Mass (kg)"]
-            output_data["Android FFM kg"] = str(round(str_to_float(values["Fat Free (g)"]) / 1000, 3))
-        elif region == "Gynoid":
-            output_data["Gynoid Fat Perc RegionFat"] = f"{float(values['Region (%Fat)']):.2f}"
-            output_data["Gynoid Fat kg"] = str(round(str_to_float(values["Fat (g)"]) / 1000, 3))
-            output_data["Gynoid Lean kg"] = str(round(str_to_float(values["Lean (g)"]) / 1000, 3))
-            output_data["Total Gynoid Mass kg"] = values["Total Mass (kg)"]
-            output_data["Gynoid FFM kg"] = str(round(str_to_float(values["Fat Free (g)"]) / 1000, 3))
+    if data.has_region("Total"):
+        values["Total Fat PercBodyWeight"] = round(data.get('Total', 'Region (%Fat)'), 2)
+        values["Total Fat kg"] = round(data.get("Total", "Fat (g)") / 1000, 3)
+        values["Total Lean kg"] = round(data.get("Total", "Lean (g)") / 1000, 3)
+        values["Total BMC kg"] = round(data.get("Total", "BMC (g)") / 1000, 3)
+        values["DEXA Weight kg"] = data.text("Total", "Total Mass (kg)")
+        values["Total FFM kg"] = round(data.get("Total", "Fat Free (g)") / 1000, 3)
+    if data.has_region("Arms"):
+        values["Total Lean Arms kg"] = round(data.get("Arms", "Lean (g)") / 1000, 3)
+    if data.has_region("Legs"):
+        values["Total Lean Legs kg"] = round(data.get("Legs", "Lean (g)") / 1000, 3)
+    if data.has_region("Trunk"):
+        values["Trunk Fat Perc RegionFat"] = round(data.get('Trunk', 'Region (%Fat)'), 2)
+        values["Trunk Fat kg"] = round(data.get("Trunk", "Fat (g)") / 1000, 3)
+        values["Trunk Lean kg"] = round(data.get("Trunk", "Lean (g)") / 1000, 3)
+        values["Total Trunk Mass kg"] = data.text("Trunk", "Total Mass (kg)")
+        values["Trunk FFM kg"] = round(data.get("Trunk", "Fat Free (g)") / 1000, 3)
+    if data.has_region("Android"):
+        values["Android Fat Perc RegionFat"] = round(data.get('Android', 'Region (%Fat)'), 2)
+        values["Android Fat kg"] = round(data.get("Android", "Fat (g)") / 1000, 3)
+        values["Android Lean kg"] = round(data.get("Android", "Lean (g)") / 1000, 3)
+        values["Total Android Mass kg"] = data.text("Android", "Total Mass (kg)")
+        values["Android FFM kg"] = round(data.get("Android", "Fat Free (g)") / 1000, 3)
+    if data.has_region("Gynoid"):
+        values["Gynoid Fat Perc RegionFat"] = round(data.get('Gynoid', 'Region (%Fat)'), 2)
+        values["Gynoid Fat kg"] = round(data.get("Gynoid", "Fat (g)") / 1000, 3)
+        values["Gynoid Lean kg"] = round(data.get("Gynoid", "Lean (g)") / 1000, 3)
+        values["Total Gynoid Mass kg"] = data.text("Gynoid", "Total Mass (kg)")
+        values["Gynoid FFM kg"] = round(data.get("Gynoid", "Fat Free (g)") / 1000, 3)
 
     # Process ROI regions
-    for region, values in data.items():
-        if region == "ROI Rib":
-            output_data["ROI Rib Fat Perc RegionFat"] = f"{float(values['Region (%Fat)']):.2f}"
-            output_data["ROI Rib Fat kg"] = str(round(str_to_float(values["Fat (g)"]) / 1000, 3))
-            output_data["ROI Rib Lean kg"] = str(round(str_to_float(values["Lean (g)"]) / 1000, 3))
-            output_data["ROI Total Rib Mass kg"] = values["Total Mass (kg)"]
-            output_data["ROI Rib FFM kg"] = str(round(str_to_float(values["Fat Free (g)"]) / 1000, 3))
-        elif region == "ROI Abdomen":
-            output_data["ROI Abdomen Fat Perc RegionFat"] = f"{float(values['Region (%Fat)']):.2f}"
-            output_data["ROI Abdomen Fat kg"] = str(round(str_to_float(values["Fat (g)"]) / 1000, 3))
-            output_data["ROI Abdomen Lean kg"] = str(round(str_to_float(values["Lean (g)"]) / 1000, 3))
-            output_data["ROI Total Abdomen Mass kg"] = values["Total Mass (kg)"]
-            output_data["ROI Abdomen FFM kg"] = str(round(str_to_float(values["Fat Free (g)"]) / 1000, 3))
+    if data.has_region("ROI Rib"):
+        values["ROI Rib Fat Perc RegionFat"] = round(data.get('ROI Rib', 'Region (%Fat)'), 2)
+        values["ROI Rib Fat kg"] = round(data.get("ROI Rib", "Fat (g)") / 1000, 3)
+        values["ROI Rib Lean kg"] = round(data.get("ROI Rib", "Lean (g)") / 1000, 3)
+        values["ROI Total Rib Mass kg"] = data.text("ROI Rib", "Total Mass (kg)")
+        values["ROI Rib FFM kg"] = round(data.get("ROI Rib", "Fat Free (g)") / 1000, 3)
+    if data.has_region("ROI Abdomen"):
+        values["ROI Abdomen Fat Perc RegionFat"] = round(data.get('ROI Abdomen', 'Region (%Fat)'), 2)
+        values["ROI Abdomen Fat kg"] = round(data.get("ROI Abdomen", "Fat (g)") / 1000, 3)
+        values["ROI Abdomen Lean kg"] = round(data.get("ROI Abdomen", "Lean (g)") / 1000, 3)
+        values["ROI Total Abdomen Mass kg"] = data.text("ROI Abdomen", "Total Mass (kg)")
+        values["ROI Abdomen FFM kg"] = round(data.get("ROI Abdomen", "Fat Free (g)") / 1000, 3)
 
     # Process Visceral Fat if present
-    if "Visceral Fat" in data:
-        output_data["Visceral Fat Of Android Region kg"] = str(round(str_to_float(data["Visceral Fat"]["Mass (g)"]) / 1000, 3))
-
-    # Apply formulas after populating the initial data
-    for column, formula in COLUMN_FORMULAS.items():
-        try:
-            output_data[column] = formula(output_data)
-        except Exception as e:
-            print(f"Error calculating {column}: {repr(e)}")
-            output_data[column] = "ERROR"
-
-    with open(output_file, 'w', newline='') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=output_columns)
-        writer.writeheader()
-        writer.writerow(output_data)
-
-    print("Generated output data:", output_data)
\ No newline at end of file
+    if data.vat_mass is not None:
+        values["Visceral Fat Of Android Region kg"] = round(data.vat_mass / 1000, 3)
+
+    return values
+
+def format_output_row(values):
+    """The output row (column name -> value string) for typed output values."""
+    output_data = dict.fromkeys(OUTPUT_COLUMNS, "")
+    for column, value in values.items():
+        if isinstance(value, str):
+            output_data[column] = value
+        elif column in FIXED_DECIMALS:
+            output_data[column] = f"{value:.{FIXED_DECIMALS[column]}f}"
+        else:
+            output_data[column] = str(value)
+    return output_data
+
+def build_output_row(data, with_formulas=True):
+    """Build the output row (column name -> value string) for one ParsedScan.
+
+    Pass with_formulas=False to leave the derived columns for a later
+    apply_formulas call over a whole batch of rows.
+    """
+    values = build_output_values(data)
+    if with_formulas:
+        apply_formulas([values])
+    return format_output_row(values)
+
+def apply_formulas(rows):
+    """Fill the derived COLUMN_FORMULAS columns of a batch of output rows at once.
+
+    Derived values that cannot be computed are written as "ERROR".
+    """
+    FORMULA_ENGINE.apply_to_rows(rows)
+
+def write_output_csv(output_data, output_file, append=False):
+    """Write one row of output values to its own CSV file, or add it to one with append."""
+    with open(output_file, 'a' if append else 'w', newline='') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=OUTPUT_COLUMNS)
+        if not append:
+            writer.writeheader()
+        row = format_output_row(output_data)
+        writer.writerow(row)
+
+    trace_debug(log, "Generated output data: %s", row)
+
+def generate_output_csv(data, output_file):
+    values = build_output_values(data)
+    apply_formulas([values])
+    write_output_csv(values, output_file)
\ No newline at end of file
@@ -0,0 +1,155 @@
+import hashlib
+import os
+import tempfile
+
+from utils import EXTRACTOR_VERSION
+
+DEFAULT_MAX_BYTES = int(os.environ.get("CHIPS_CACHE_MAX_MB", "512")) * 1024 * 1024
+
+def default_cache_dir():
+    """Location of the extraction cache.
+
+    CHIPS_CACHE_DIR overrides the default, e.g. to point several workstations
+    at the same network share.
+    """
+    configured = os.environ.get("CHIPS_CACHE_DIR")
+    if configured:
+        return configured
+    if os.name == "nt":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+        return os.path.join(base, "CHIPS", "cache")
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "chips")
+
+def hash_file(path, chunk_size=1024 * 1024):
+    """Return the SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class ExtractionCache:
+    """Persistent cache of extracted report text, keyed on file content.
+
+    Entries are plain UTF-8 files named after the SHA-256 of the input plus
+    the extractor version, so the same scan is found again no matter where it
+    is stored or what it is called. Writes go through a temporary file and
+    os.replace, which makes the cache safe to share between processes and
+    workstations. Recency is tracked through file modification times, and the
+    least recently used entries are evicted once max_bytes is exceeded.
+
+    The cache directory is scanned for its size once, on the first write,
+    and the size is then kept up to date from the entries written. A copy
+    sent to a worker process does not track the size itself: it counts the
+    bytes it writes in untracked_bytes, for the batch to pass back to the
+    original through add_size(), so that workers never scan the directory.
+    """
+
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.untracked_bytes = 0
+        self._approx_bytes = None
+        self._tracks_size = True
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.update(untracked_bytes=0, _approx_bytes=None, _tracks_size=False)
+        return state
+
+    def key_for(self, path, mode="report"):
+        content_hash = hash_file(path)
+        return hashlib.sha256(f"{content_hash}:{EXTRACTOR_VERSION}:{mode}".encode()).hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.txt")
+
+    def get(self, key):
+        """Return the cached text for key, or None on a miss."""
+        entry = self._entry_path(key)
+        try:
+            with open(entry, 'r', encoding='utf-8', newline='') as f:
+                text = f.read()
+            os.utime(entry)
+            return text
+        except OSError:
+            # Missing, or evicted by another process in the meantime.
+            return None
+
+    def put(self, key, text):
+        entry = self._entry_path(key)
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(entry), suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8', newline='') as f:
+                f.write(text)
+            os.replace(temp_path, entry)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        size = os.path.getsize(entry)
+        if self._tracks_size:
+            self.add_size(size)
+        else:
+            self.untracked_bytes += size
+
+    def add_size(self, size):
+        """Account for size bytes of new entries, evicting if the cache is now too large."""
+        if self._approx_bytes is None:
+            self._approx_bytes = self._scan_size()
+        else:
+            self._approx_bytes += size
+        if self._approx_bytes > self.max_bytes:
+            self.evict()
+
+    def get_or_extract(self, path, extract, mode="report"):
+        """Return the text for path from the cache, calling extract(path) on a miss."""
+        key = self.key_for(path, mode)
+        text = self.get(key)
+        if text is None:
+            text = extract(path)
+            self.put(key, text)
+        return text
+
+    def _entries(self):
+        if not os.path.isdir(self.directory):
+            return
+        for shard in os.scandir(self.directory):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith(".txt"):
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    yield entry.path, stat.st_size, stat.st_mtime
+
+    def _scan_size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self):
+        """Remove least recently used entries until the cache is under 90% of max_bytes."""
+        entries = sorted(self._entries(), key=lambda e: e[2])
+        total = sum(size for _, size, _ in entries)
+        target = int(self.max_bytes * 0.9)
+        for path, size, _ in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+        self._approx_bytes = total
+
+    def clear(self):
+        for path, _, _ in list(self._entries()):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self._approx_bytes = 0
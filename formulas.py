@@ -0,0 +1,139 @@
+import math
+
+import numpy as np
+
+# Below this many rows, setting up the arrays costs more than evaluating the
+# formulas row by row.
+MIN_ARRAY_ROWS = 8
+
+def round_like_builtin(values, decimals):
+    """Round an array exactly like the built-in round(value, decimals).
+
+    np.round scales by 10**decimals before rounding, which can land on the
+    wrong side of a .5 boundary, or overflow for values near the float limit.
+    Values whose scaled fraction is that close to .5, or that overflowed, are
+    re-rounded with round() so every cell matches the per-row results.
+    """
+    rounded = np.round(values, decimals)
+    scaled = values * 10.0 ** decimals
+    distance = np.abs(np.abs(scaled - np.trunc(scaled)) - 0.5)
+    near_half = np.flatnonzero((distance <= 1e-7 * np.maximum(1.0, np.abs(scaled)))
+                               | (np.isinf(scaled) & np.isfinite(values)))
+    for index in near_half:
+        rounded[index] = round(float(values[index]), decimals)
+    return rounded
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+class FormulaEngine:
+    """Evaluates derived output columns for a whole batch of rows at once.
+
+    formulas maps an output column to (input columns, function, decimals).
+    Each function receives one float64 array per input column and returns an
+    array; the result is rounded to `decimals` exactly as round() would. The
+    evaluation order is taken from the dependency graph, built once here, so a
+    formula may read other derived columns regardless of the order the
+    formulas are declared in.
+
+    Missing or non-numeric inputs are NaN, results that are not finite (for
+    example a division by zero) become NaN, and NaN propagates to every
+    formula that depends on it.
+    """
+
+    def __init__(self, formulas):
+        self.formulas = dict(formulas)
+        self.order = self._evaluation_order()
+        derived = set(self.formulas)
+        self.input_columns = list(dict.fromkeys(
+            column
+            for inputs, _, _ in self.formulas.values()
+            for column in inputs
+            if column not in derived
+        ))
+
+    def _evaluation_order(self):
+        """Topologically sort the formulas (Kahn's algorithm, stable in declaration order)."""
+        dependents = {name: [] for name in self.formulas}
+        unresolved = {}
+        for name, (inputs, _, _) in self.formulas.items():
+            derived_inputs = {column for column in inputs if column in self.formulas}
+            unresolved[name] = len(derived_inputs)
+            for column in derived_inputs:
+                dependents[column].append(name)
+
+        ready = [name for name, count in unresolved.items() if count == 0]
+        order = []
+        while ready:
+            name = ready.pop(0)
+            order.append(name)
+            for dependent in dependents[name]:
+                unresolved[dependent] -= 1
+                if unresolved[dependent] == 0:
+                    ready.append(dependent)
+
+        if len(order) != len(self.formulas):
+            cyclic = sorted(set(self.formulas) - set(order))
+            raise ValueError(f"Circular dependency between formulas: {cyclic}")
+        return order
+
+    def evaluate(self, columns):
+        """Compute every derived column.
+
+        columns maps input column names to equal-length float64 arrays, with
+        NaN for missing values. Returns a dict of derived column name to array.
+        """
+        size = len(next(iter(columns.values()))) if columns else 0
+        values = dict(columns)
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            for name in self.order:
+                inputs, function, decimals = self.formulas[name]
+                args = [values[column] if column in values else np.full(size, np.nan)
+                        for column in inputs]
+                result = np.asarray(function(*args), dtype=np.float64)
+                result = np.where(np.isfinite(result), result, np.nan)
+                values[name] = round_like_builtin(result, decimals)
+        return {name: values[name] for name in self.order}
+
+    def evaluate_row(self, values):
+        """Compute every derived column for one row with plain floats.
+
+        Same results as evaluate() on a one-row batch, without the cost of
+        setting up arrays, which dominates for a single row.
+        """
+        values = dict(values)
+        for name in self.order:
+            inputs, function, decimals = self.formulas[name]
+            try:
+                result = function(*[values.get(column, math.nan) for column in inputs])
+            except (ZeroDivisionError, OverflowError):
+                result = math.nan
+            values[name] = round(result, decimals) if math.isfinite(result) else math.nan
+        return {name: values[name] for name in self.order}
+
+    def apply_to_rows(self, rows, missing="ERROR"):
+        """Fill the derived columns of output rows (dicts of values) in place.
+
+        Inputs may be floats or value strings. Results are written as floats,
+        or as `missing` if they could not be computed. Batches smaller than
+        MIN_ARRAY_ROWS, such as the single row of per-file output, are
+        evaluated row by row with evaluate_row.
+        """
+        if not rows:
+            return
+        if len(rows) < MIN_ARRAY_ROWS:
+            for row in rows:
+                inputs = {column: _to_float(row.get(column)) for column in self.input_columns}
+                for name, value in self.evaluate_row(inputs).items():
+                    row[name] = missing if value != value else value
+            return
+        columns = {
+            column: np.array([_to_float(row.get(column)) for row in rows], dtype=np.float64)
+            for column in self.input_columns
+        }
+        for name, result in self.evaluate(columns).items():
+            for row, value in zip(rows, result.tolist()):
+                row[name] = missing if value != value else value
@@ -1,19 +1,26 @@
 import sys
 import os
+import time
+# Start of the start-up report's "import" stage
+STARTUP_START = time.perf_counter()
 import base64
+import json
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                             QHBoxLayout, QPushButton, QLabel, QFileDialog, 
-                            QListWidget, QProgressBar, QMessageBox, QFrame,
-                            QComboBox, QSizePolicy)
-from PyQt6.QtCore import Qt, QThread, pyqtSignal
+                            QListView, QProgressBar, QMessageBox, QFrame,
+                            QComboBox, QSizePolicy, QSpinBox, QCheckBox)
+from PyQt6.QtCore import Qt, QThread, pyqtSignal, QAbstractListModel, QModelIndex
 from PyQt6.QtGui import QFont, QDragEnterEvent, QDropEvent, QIcon, QPalette, QColor
 from datetime import datetime
 
-from utils import xps_to_text, group_related_files, get_file_prefix, merge_data
-from cuirass_processor import parse_body_composition as cuirass_parse
-from cuirass_processor import generate_output_csv as cuirass_generate
-from fuvid_processor import parse_body_composition as fuvid_parse
-from fuvid_processor import generate_output_csv as fuvid_generate
+from batch_engine import (run_batch, default_worker_count, BACKENDS, DEFAULT_BACKEND,
+                          BatchControl, iter_input_files, INPUT_EXTENSIONS)
+from extraction_cache import ExtractionCache
+from timing import format_timing_summary, StageTimer
+from chips_logging import get_logger
+from progress import format_progress, format_throughput
+
+log = get_logger("gui")
 
 # Holiday Detection
 HOLIDAY_TITLES = {
@@ -253,13 +260,8 @@ def get_holiday_background_pattern(holiday):
         """
     }
     return patterns.get(holiday, "")
-def apply_holiday_theme(window):
-    """Apply holiday-specific theme to the window."""
-    holiday = get_current_holiday()
-    if not holiday:
-        return
-        
-    palette = window.palette()
+def holiday_theme(holiday):
+    """Window colour and stylesheet for a holiday."""
     background_pattern = get_holiday_background_pattern(holiday)
     if background_pattern:
         base64_pattern = base64.b64encode(background_pattern.encode()).decode()
@@ -355,9 +357,7 @@ def apply_holiday_theme(window):
     }
     
     style = theme_styles[holiday]
-    palette.setColor(QPalette.ColorRole.Window, QColor(style["bg_color"]))
-    
-    window.setStyleSheet(f"""
+    return style["bg_color"], f"""
         QMainWindow {{
             background-color: {style["bg_color"]};
             background-image: {background_image};
@@ -387,13 +387,13 @@ def apply_holiday_theme(window):
             border-radius: 5px;
             padding: 5px;
         }}
-        QListWidget {{
+        QListView {{
             background-color: white;
             border: 1px solid {style["button_color"]};
             border-radius: 5px;
             padding: 5px;
         }}
-        QListWidget::item {{
+        QListView::item {{
             padding: 3px;
             border-bottom: 1px solid #ECF0F1;
         }}
@@ -406,114 +406,207 @@ def apply_holiday_theme(window):
         QProgressBar::chunk {{
             background-color: {style["button_color"]};
         }}
-    """)
-    
+    """
+
+def apply_holiday_theme(window):
+    """Apply holiday-specific theme to the window."""
+    holiday = get_current_holiday()
+    if not holiday:
+        return
+        
+    bg_color, stylesheet = holiday_theme(holiday)
+    palette = window.palette()
+    palette.setColor(QPalette.ColorRole.Window, QColor(bg_color))
+    window.setStyleSheet(stylesheet)
     window.setWindowTitle(HOLIDAY_TITLES.get(holiday, "CHIPS"))
     window.setPalette(palette)
 
+# Study dropdown entries and the study types each one writes out
+STUDY_SELECTIONS = {
+    "Cuirass": ["Cuirass"],
+    "FUVID": ["FUVID"],
+    "Cuirass + FUVID": ["Cuirass", "FUVID"],
+}
+
+# Output dropdown entries and the ProcessingThread output options they select
+OUTPUT_MODES = {
+    "Per-file CSVs": {},
+    "Combined CSV": {"per_file_output": False, "combined_output": True},
+    "Per-file + Combined CSV": {"combined_output": True},
+    "Parquet": {"per_file_output": False, "columnar_format": "parquet"},
+    "Feather": {"per_file_output": False, "columnar_format": "feather"},
+}
+
 class ProcessingThread(QThread):
     """Thread for handling file processing"""
-    progress = pyqtSignal(int)
+    progress = pyqtSignal(dict)
     finished = pyqtSignal(dict)
     
-    def __init__(self, files, output_dir, processing_type):
+    def __init__(self, files, output_dir, processing_type, max_workers=None, backend=DEFAULT_BACKEND,
+                 cache=None, per_file_output=True, combined_output=False, columnar_format=None,
+                 incremental=False, pair_across_batches=True, multi_report_xps=False):
         super().__init__()
         self.files = files
         self.output_dir = output_dir
         self.processing_type = processing_type
+        self.max_workers = max_workers
+        self.backend = backend
+        self.cache = cache
+        self.per_file_output = per_file_output
+        self.combined_output = combined_output
+        self.columnar_format = columnar_format
+        self.incremental = incremental
+        self.pair_across_batches = pair_across_batches
+        self.multi_report_xps = multi_report_xps
+        self.control = BatchControl()
         
     def run(self):
         try:
-            success_count = 0
-            error_count = 0
-            merged_count = 0
-            total_files = len(self.files)
-            processed_count = 0
-            
-            parse_function = cuirass_parse if self.processing_type == "Cuirass" else fuvid_parse
-            generate_function = cuirass_generate if self.processing_type == "Cuirass" else fuvid_generate
-            
-            file_groups = group_related_files(self.files)
-            standalone_files = [f for f in self.files if get_file_prefix(f) is None]
-            
-            for prefix, files in file_groups.items():
-                try:
-                    if len(files) == 2:
-                        data1 = parse_function(xps_to_text(files[0]) if files[0].lower().endswith('.xps') 
-                                            else open(files[0], 'r').read())
-                        data2 = parse_function(xps_to_text(files[1]) if files[1].lower().endswith('.xps') 
-                                            else open(files[1], 'r').read())
-                        
-                        standard_data = data1 if data1["_format"] == "standard" else data2
-                        numeric_data = data1 if data1["_format"] == "numeric" else data2
-                        
-                        merged_data = merge_data(standard_data, numeric_data)
-                        
-                        if merged_data:
-                            output_file = os.path.join(self.output_dir, f"{prefix}_merged_output.csv")
-                            generate_function(merged_data, output_file)
-                            merged_count += 1
-                            success_count += 2
-                            processed_count += 2
-                    else:
-                        if self.process_single_file(files[0]):
-                            success_count += 1
-                        else:
-                            error_count += 1
-                        processed_count += 1
-                        
-                except Exception as e:
-                    error_count += 1
-                    processed_count += len(files)
-                    print(f"Error processing files with prefix {prefix}: {str(e)}")
-                
-                self.progress.emit(int(processed_count / total_files * 100))
-            
-            for file in standalone_files:
-                if self.process_single_file(file):
-                    success_count += 1
-                else:
-                    error_count += 1
-                processed_count += 1
-                self.progress.emit(int(processed_count / total_files * 100))
-            
-            results = {
-                'success': success_count,
-                'errors': error_count,
-                'merged': merged_count
-            }
+            results = run_batch(
+                self.files,
+                self.output_dir,
+                self.processing_type,
+                max_workers=self.max_workers,
+                backend=self.backend,
+                on_progress=self.report_progress,
+                cache=self.cache,
+                per_file_output=self.per_file_output,
+                combined_output=self.combined_output,
+                columnar_format=self.columnar_format,
+                incremental=self.incremental,
+                control=self.control,
+                pair_across_batches=self.pair_across_batches,
+                multi_report_xps=self.multi_report_xps
+            )
             self.finished.emit(results)
             
         except Exception as e:
             self.finished.emit({'error': str(e)})
     
-    def process_single_file(self, file):
-        try:
-            content = xps_to_text(file) if file.lower().endswith('.xps') else open(file, 'r').read()
-            parse_function = cuirass_parse if self.processing_type == "Cuirass" else fuvid_parse
-            generate_function = cuirass_generate if self.processing_type == "Cuirass" else fuvid_generate
-            
-            parsed_data = parse_function(content)
-            if parsed_data:
-                base_name = os.path.splitext(os.path.basename(file))[0]
-                output_file = os.path.join(self.output_dir, f"{base_name}_output.csv")
-                generate_function(parsed_data, output_file)
-                return True
-            return False
-        except Exception as e:
-            print(f"Error processing {file}: {str(e)}")
-            return False
+    def cancel(self, abort=False):
+        """Stop scheduling new files; with abort, also stop files in progress."""
+        self.control.cancel(abort)
+    
+    def pause(self):
+        self.control.pause()
+    
+    def resume(self):
+        self.control.resume()
+    
+    def report_progress(self, snapshot):
+        # run_batch already limits these to a few per second
+        self.progress.emit(snapshot)
+
+# Files found by a folder scan are handed to the window in batches of up to
+# this many, or whatever was found in the last SCAN_FLUSH_INTERVAL seconds
+SCAN_BATCH_SIZE = 5000
+SCAN_FLUSH_INTERVAL = 0.25
+
+class DirectoryScanThread(QThread):
+    """Thread for finding the input files under dropped or selected folders"""
+    found = pyqtSignal(list)
+    
+    def __init__(self, directories):
+        super().__init__()
+        self.directories = directories
+        self._stopped = False
         
+    def run(self):
+        batch = []
+        last_flush = time.monotonic()
+        for directory in self.directories:
+            for file in iter_input_files(directory):
+                if self._stopped:
+                    return
+                batch.append(file)
+                if len(batch) >= SCAN_BATCH_SIZE or time.monotonic() - last_flush >= SCAN_FLUSH_INTERVAL:
+                    self.found.emit(batch)
+                    batch = []
+                    last_flush = time.monotonic()
+        if batch and not self._stopped:
+            self.found.emit(batch)
+    
+    def stop(self):
+        self._stopped = True
+
+class FileListModel(QAbstractListModel):
+    """The selected input files, shown by file name.
+
+    Paths are kept in selection order in a plain list, with a set alongside
+    for duplicate checks, so adding n files costs O(n). Rows are rendered by
+    the view on demand; nothing is created per file.
+    """
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._paths = []
+        self._seen = set()
+        
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._paths)
+        
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.ItemDataRole.DisplayRole:
+            return os.path.basename(self._paths[index.row()])
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return self._paths[index.row()]
+        return None
+        
+    def add_paths(self, paths):
+        """Append the paths not already in the list; returns how many were added."""
+        new_paths = []
+        for path in paths:
+            if path not in self._seen:
+                self._seen.add(path)
+                new_paths.append(path)
+        if new_paths:
+            first = len(self._paths)
+            self.beginInsertRows(QModelIndex(), first, first + len(new_paths) - 1)
+            self._paths.extend(new_paths)
+            self.endInsertRows()
+        return len(new_paths)
+        
+    def clear(self):
+        self.beginResetModel()
+        self._paths = []
+        self._seen = set()
+        self.endResetModel()
+        
+    def paths(self):
+        return list(self._paths)
+        
+    def __len__(self):
+        return len(self._paths)
+
 class ModernDEXAConverter(QMainWindow):
-    def __init__(self):
+    # Emitted once, when the window has been painted for the first time
+    first_painted = pyqtSignal()
+    
+    def __init__(self, startup_timer=None):
         super().__init__()
+        startup_timer = startup_timer or StageTimer()
         self.setWindowTitle("CHIPS")
         self.setMinimumWidth(800)
         self.setMinimumHeight(600)
-        self.files = []
+        self.file_model = FileListModel(self)
+        self.scan_threads = []
         self.output_dir = None
-        self.init_ui()
-        apply_holiday_theme(self)
+        self.extraction_cache = ExtractionCache()
+        self.setAcceptDrops(True)
+        self.painted = False
+        with startup_timer.stage("window"):
+            self.init_ui()
+        # Before the window is shown, so its first frame is already themed
+        with startup_timer.stage("theme"):
+            apply_holiday_theme(self)
+        
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self.painted:
+            self.painted = True
+            self.first_painted.emit()
         
     def init_ui(self):
         central_widget = QWidget()
@@ -554,14 +647,66 @@ class ModernDEXAConverter(QMainWindow):
         selection_layout.addWidget(type_label)
         
         self.processing_type = QComboBox()
-        self.processing_type.addItems(["Cuirass", "FUVID"])
+        self.processing_type.addItems(list(STUDY_SELECTIONS))
         self.processing_type.setMinimumWidth(250)
         selection_layout.addWidget(self.processing_type)
+        
+        workers_label = QLabel("Workers: ")
+        workers_label.setFont(QFont("Arial", 11))
+        workers_label.setStyleSheet("color: #2C3E50;")
+        selection_layout.addWidget(workers_label)
+        
+        self.worker_count = QSpinBox()
+        self.worker_count.setRange(1, max(default_worker_count(), 1) * 4)
+        self.worker_count.setValue(default_worker_count())
+        selection_layout.addWidget(self.worker_count)
+        
+        self.backend = QComboBox()
+        self.backend.addItems(list(BACKENDS))
+        self.backend.setCurrentText(DEFAULT_BACKEND)
+        self.backend.setToolTip("Run the workers as processes, or as threads in this process")
+        selection_layout.addWidget(self.backend)
+        
+        output_mode_label = QLabel("Output: ")
+        output_mode_label.setFont(QFont("Arial", 11))
+        output_mode_label.setStyleSheet("color: #2C3E50;")
+        selection_layout.addWidget(output_mode_label)
+        
+        self.output_mode = QComboBox()
+        self.output_mode.addItems(list(OUTPUT_MODES))
+        self.output_mode.currentTextChanged.connect(self.update_skip_unchanged)
+        selection_layout.addWidget(self.output_mode)
+        
+        # Incremental runs only apply to per-file output; combined outputs
+        # need every row on each run.
+        self.skip_unchanged = QCheckBox("Skip unchanged")
+        self.skip_unchanged.setChecked(True)
+        self.skip_unchanged.setToolTip("Only convert files that are new or changed since they "
+                                       "were last converted into the output directory")
+        selection_layout.addWidget(self.skip_unchanged)
+        
+        self.pair_across_batches = QCheckBox("Pair across batches")
+        self.pair_across_batches.setChecked(True)
+        self.pair_across_batches.setToolTip("Merge a file with its partner from an earlier "
+                                            "conversion into the same output directory")
+        selection_layout.addWidget(self.pair_across_batches)
+        
+        # Off by default: reading XPS files to the end slows down the usual
+        # single-report exports. Text exports are always split.
+        self.multi_report_xps = QCheckBox("All XPS reports")
+        self.multi_report_xps.setToolTip("Read XPS exports to the end and convert every report "
+                                         "in them, not just the first")
+        selection_layout.addWidget(self.multi_report_xps)
         selection_layout.addStretch()
         layout.addWidget(selection_container)
         
         # File List
-        self.file_list = QListWidget()
+        self.file_list = QListView()
+        self.file_list.setModel(self.file_model)
+        # Lay rows out a slice at a time so long lists never block the window
+        self.file_list.setUniformItemSizes(True)
+        self.file_list.setLayoutMode(QListView.LayoutMode.Batched)
+        self.file_list.setBatchSize(2000)
         self.file_list.setMaximumHeight(150)
         layout.addWidget(self.file_list)
         
@@ -576,6 +721,13 @@ class ModernDEXAConverter(QMainWindow):
         self.add_button.clicked.connect(self.select_files)
         button_layout.addWidget(self.add_button)
         
+        self.add_folder_button = QPushButton("Add Folder")
+        self.add_folder_button.setMinimumWidth(120)
+        self.add_folder_button.setToolTip("Add every XPS and text file in a folder and its subfolders; "
+                                          "files and folders can also be dropped on the window")
+        self.add_folder_button.clicked.connect(self.select_folder)
+        button_layout.addWidget(self.add_folder_button)
+        
         self.clear_button = QPushButton("Clear Selection")
         self.clear_button.setMinimumWidth(120)
         self.clear_button.clicked.connect(self.clear_selection)
@@ -597,6 +749,25 @@ class ModernDEXAConverter(QMainWindow):
         self.progress_bar.setVisible(False)
         layout.addWidget(self.progress_bar)
         
+        self.progress_label = QLabel("")
+        self.progress_label.setStyleSheet("color: #7F8C8D; font-size: 11px;")
+        self.progress_label.setVisible(False)
+        layout.addWidget(self.progress_label)
+        
+        # Pause / Cancel, shown while a conversion is running
+        self.run_controls = QWidget()
+        run_controls_layout = QHBoxLayout(self.run_controls)
+        run_controls_layout.setContentsMargins(0, 0, 0, 0)
+        self.pause_button = QPushButton("Pause")
+        self.pause_button.clicked.connect(self.toggle_pause)
+        run_controls_layout.addWidget(self.pause_button)
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.setToolTip("Stop after the files in progress; click again to abort them")
+        self.cancel_button.clicked.connect(self.cancel_conversion)
+        run_controls_layout.addWidget(self.cancel_button)
+        self.run_controls.setVisible(False)
+        layout.addWidget(self.run_controls)
+        
         # Convert Button
         self.convert_button = QPushButton("Convert Files")
         self.convert_button.clicked.connect(self.start_conversion)
@@ -635,12 +806,58 @@ class ModernDEXAConverter(QMainWindow):
             self.holiday_label.setText("")
     
     def add_files(self, file_paths):
-        for file_path in file_paths:
-            if file_path not in self.files:
-                self.files.append(file_path)
-                self.file_list.addItem(os.path.basename(file_path))
+        self.file_model.add_paths(file_paths)
+        if self.scan_threads:
+            self.status_label.setText(f"Scanning folders... {len(self.file_model)} files selected")
         self.update_convert_button()
         
+    def add_folders(self, directories):
+        """Scan directories for input files on a background thread."""
+        thread = DirectoryScanThread(directories)
+        thread.found.connect(self.add_files)
+        thread.finished.connect(lambda: self.scan_finished(thread))
+        self.scan_threads.append(thread)
+        self.status_label.setText("Scanning folders...")
+        self.update_convert_button()
+        thread.start()
+        
+    def scan_finished(self, thread):
+        if thread in self.scan_threads:
+            self.scan_threads.remove(thread)
+            if not self.scan_threads:
+                self.status_label.setText("Ready")
+            self.update_convert_button()
+        
+    def stop_scans(self):
+        for thread in self.scan_threads:
+            thread.found.disconnect()
+            thread.stop()
+        for thread in self.scan_threads:
+            thread.wait()
+        self.scan_threads.clear()
+        
+    def select_folder(self):
+        directory = QFileDialog.getExistingDirectory(self, "Select Folder")
+        if directory:
+            self.add_folders([directory])
+        
+    def dragEnterEvent(self, event: QDragEnterEvent):
+        if event.mimeData().hasUrls():
+            event.acceptProposedAction()
+        
+    def dropEvent(self, event: QDropEvent):
+        paths = [url.toLocalFile() for url in event.mimeData().urls() if url.isLocalFile()]
+        self.add_files([path for path in paths
+                        if os.path.isfile(path) and path.lower().endswith(INPUT_EXTENSIONS)])
+        directories = [path for path in paths if os.path.isdir(path)]
+        if directories:
+            self.add_folders(directories)
+        event.acceptProposedAction()
+        
+    def closeEvent(self, event):
+        self.stop_scans()
+        super().closeEvent(event)
+        
     def select_files(self):
         files, _ = QFileDialog.getOpenFileNames(
             self,
@@ -651,8 +868,9 @@ class ModernDEXAConverter(QMainWindow):
         self.add_files(files)
         
     def clear_selection(self):
-        self.files.clear()
-        self.file_list.clear()
+        self.stop_scans()
+        self.status_label.setText("")
+        self.file_model.clear()
         self.update_convert_button()
         
     def select_output_directory(self):
@@ -664,44 +882,138 @@ class ModernDEXAConverter(QMainWindow):
             self.output_label.setText(f"Output Directory: ...{self.output_dir[-30:]}")
             self.update_convert_button()
             
+    def update_skip_unchanged(self, mode):
+        options = OUTPUT_MODES[mode]
+        self.skip_unchanged.setEnabled(
+            not (options.get("combined_output") or options.get("columnar_format")))
+        
     def update_convert_button(self):
-        self.convert_button.setEnabled(bool(self.files and self.output_dir))
+        self.convert_button.setEnabled(bool(len(self.file_model) and self.output_dir and not self.scan_threads))
         
     def start_conversion(self):
+        self.progress_bar.setValue(0)
         self.progress_bar.setVisible(True)
+        self.progress_label.setText("")
+        self.progress_label.setVisible(True)
+        self.last_progress = None
         self.convert_button.setEnabled(False)
+        self.pause_button.setText("Pause")
+        self.pause_button.setEnabled(True)
+        self.cancel_button.setText("Cancel")
+        self.run_controls.setVisible(True)
         self.status_label.setText("Processing files...")
         
-        processing_type = self.processing_type.currentText()
-        self.processing_thread = ProcessingThread(self.files, self.output_dir, processing_type)
+        processing_type = STUDY_SELECTIONS[self.processing_type.currentText()]
+        output_options = OUTPUT_MODES[self.output_mode.currentText()]
+        self.processing_thread = ProcessingThread(self.file_model.paths(), self.output_dir,
+                                                  processing_type,
+                                                  max_workers=self.worker_count.value(),
+                                                  backend=self.backend.currentText(),
+                                                  cache=self.extraction_cache,
+                                                  incremental=(self.skip_unchanged.isEnabled()
+                                                               and self.skip_unchanged.isChecked()),
+                                                  pair_across_batches=self.pair_across_batches.isChecked(),
+                                                  multi_report_xps=self.multi_report_xps.isChecked(),
+                                                  **output_options)
         self.processing_thread.progress.connect(self.update_progress)
         self.processing_thread.finished.connect(self.conversion_finished)
         self.processing_thread.start()
         
-    def update_progress(self, value):
-        self.progress_bar.setValue(value)
+    def toggle_pause(self):
+        if self.processing_thread.control.paused:
+            self.processing_thread.resume()
+            self.pause_button.setText("Pause")
+            self.status_label.setText("Processing files...")
+        else:
+            self.processing_thread.pause()
+            self.pause_button.setText("Resume")
+            self.status_label.setText("Paused - files in progress are finishing")
+        
+    def cancel_conversion(self):
+        if self.processing_thread.control.cancelled:
+            self.processing_thread.cancel(abort=True)
+            self.cancel_button.setEnabled(False)
+            self.status_label.setText("Aborting...")
+        else:
+            self.processing_thread.cancel()
+            self.cancel_button.setText("Abort")
+            self.pause_button.setEnabled(False)
+            self.status_label.setText("Cancelling - finishing the files in progress...")
+        
+    def update_progress(self, snapshot):
+        self.last_progress = snapshot
+        self.progress_bar.setValue(snapshot['percent'])
+        self.progress_label.setText(format_progress(snapshot))
         
     def conversion_finished(self, results):
         self.progress_bar.setVisible(False)
+        self.progress_label.setVisible(False)
+        self.run_controls.setVisible(False)
+        self.cancel_button.setEnabled(True)
         self.convert_button.setEnabled(True)
         
         if 'error' in results:
             QMessageBox.critical(self, "Error", f"An error occurred: {results['error']}")
             return
             
-        message = f"🎊 Conversion complete! 🎊\n\n"
+        if results['cancelled'] > 0:
+            message = f"Conversion cancelled: {results['cancelled']} files were not converted\n\n"
+        else:
+            message = f"🎊 Conversion complete! 🎊\n\n"
         if results['merged'] > 0:
             message += f"Successfully merged: {results['merged']} pairs ({results['merged'] * 2} files)\n"
+        if results['merged_with_earlier'] > 0:
+            message += f"Merged with a file from an earlier batch: {results['merged_with_earlier']} files\n"
         message += f"Successfully processed: {results['success']} files\n"
+        if results['skipped'] > 0:
+            message += f"Skipped (up to date): {results['skipped']} files\n"
         if results['errors'] > 0:
-            message += f"Errors encountered: {results['errors']} files"
+            message += f"Errors encountered: {results['errors']} files\n"
+        if self.last_progress:
+            message += format_throughput(self.last_progress) + "\n"
+        if results.get('timing') and results['timing']['stages']:
+            message += "\nTime per stage:\n" + "\n".join(format_timing_summary(results['timing']))
             
-        QMessageBox.information(self, "Success", message)
+        QMessageBox.information(self, "Cancelled" if results['cancelled'] > 0 else "Success", message)
         self.status_label.setText("Ready")
 
+def report_startup(stages):
+    """Log the start-up stage times and add them to CHIPS_STARTUP_REPORT if set.
+
+    CHIPS_STARTUP_REPORT names a file that gets one JSON line per launch, so
+    cold-start times can be tracked across machines and releases; "-" prints
+    the times to stderr instead. The times are also logged at INFO, which
+    only shows where logging is configured for it: the GUI leaves the
+    console at WARNING.
+    """
+    total = sum(stages.values())
+    summary = ", ".join(f"{stage} {seconds * 1000:.0f} ms" for stage, seconds in stages.items())
+    log.info("Start-up took %.0f ms (%s)", total * 1000, summary)
+    report = os.environ.get("CHIPS_STARTUP_REPORT")
+    if report == "-":
+        print(f"Start-up took {total * 1000:.0f} ms ({summary})", file=sys.stderr)
+    elif report:
+        record = {"timestamp": datetime.now().isoformat(timespec="seconds"), "total": total,
+                  "stages": stages}
+        try:
+            with open(report, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record) + "\n")
+        except OSError as e:
+            log.warning("Could not write start-up report to %s: %s", report, e)
+
 def main():
-    app = QApplication(sys.argv)
-    window = ModernDEXAConverter()
+    startup = StageTimer()
+    startup.stages["import"] = time.perf_counter() - STARTUP_START
+    with startup.stage("application"):
+        app = QApplication(sys.argv)
+    window = ModernDEXAConverter(startup)
+
+    def first_paint():
+        startup.stages["first_paint"] = time.perf_counter() - shown
+        report_startup(startup.stages)
+
+    window.first_painted.connect(first_paint)
+    shown = time.perf_counter()
     window.show()
     sys.exit(app.exec())
 
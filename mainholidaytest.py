@@ -9,7 +9,7 @@ from PyQt6.QtCore import Qt, QThread, pyqtSignal
 from PyQt6.QtGui import QFont, QDragEnterEvent, QDropEvent, QIcon, QPalette, QColor
 from datetime import datetime
 
-from utils import xps_to_text, group_related_files, get_file_prefix, merge_data
+from utils import xps_to_text, text_report_text, group_related_files, get_file_prefix, merge_data
 from cuirass_processor import parse_body_composition as cuirass_parse
 from cuirass_processor import generate_output_csv as cuirass_generate
 from fuvid_processor import parse_body_composition as fuvid_parse
@@ -372,12 +372,12 @@ class ProcessingThread(QThread):
                 try:
                     if len(files) == 2:
                         data1 = parse_function(xps_to_text(files[0]) if files[0].lower().endswith('.xps') 
-                                            else open(files[0], 'r').read())
+                                            else text_report_text(files[0]))
                         data2 = parse_function(xps_to_text(files[1]) if files[1].lower().endswith('.xps') 
-                                            else open(files[1], 'r').read())
+                                            else text_report_text(files[1]))
                         
-                        standard_data = data1 if data1["_format"] == "standard" else data2
-                        numeric_data = data1 if data1["_format"] == "numeric" else data2
+                        standard_data = data1 if data1.report_format == "standard" else data2
+                        numeric_data = data1 if data1.report_format == "numeric" else data2
                         
                         merged_data = merge_data(standard_data, numeric_data)
                         
@@ -421,7 +421,7 @@ class ProcessingThread(QThread):
     
     def process_single_file(self, file):
         try:
-            content = xps_to_text(file) if file.lower().endswith('.xps') else open(file, 'r').read()
+            content = xps_to_text(file) if file.lower().endswith('.xps') else text_report_text(file)
             parse_function = cuirass_parse if self.processing_type == "Cuirass" else fuvid_parse
             generate_function = cuirass_generate if self.processing_type == "Cuirass" else fuvid_generate
             
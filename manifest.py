@@ -0,0 +1,108 @@
+import json
+import os
+import tempfile
+
+from extraction_cache import hash_file
+from report_parser import PARSER_VERSION
+
+MANIFEST_NAME = "chips_manifest.json"
+MANIFEST_VERSION = 1
+
+def fingerprint(path):
+    """Size, modification time and content hash of an input file."""
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": hash_file(path)}
+
+def write_json_atomic(path, data):
+    """Write data as JSON to path through a temporary file, so readers never see half a file."""
+    directory = os.path.dirname(path) or "."
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+def group_key(files):
+    """Manifest key for a work item: its input paths, absolute and sorted."""
+    return "|".join(sorted(os.path.abspath(f) for f in files))
+
+class Manifest:
+    """Record of the inputs already converted into an output directory.
+
+    Stored as chips_manifest.json next to the outputs. For every study it maps
+    each converted work item (a single file or a merged pair) to the
+    fingerprint of its inputs at the time of conversion. A work item is up to
+    date when its inputs still match and its output files exist. Size and
+    modification time are compared first; the content hash is only computed
+    when the modification time changed, so a file that was merely touched or
+    copied is not converted again.
+
+    The whole manifest is discarded when PARSER_VERSION changes.
+    """
+
+    def __init__(self, output_dir):
+        self.path = os.path.join(output_dir, MANIFEST_NAME)
+        self.entries = {}
+        self._dirty = False
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return
+        if (not isinstance(stored, dict)
+                or stored.get("version") != MANIFEST_VERSION
+                or stored.get("parser_version") != PARSER_VERSION):
+            return
+        self.entries = stored.get("entries", {})
+
+    def is_up_to_date(self, study, files, output_files):
+        """True if files were converted for study and output_files still exist."""
+        recorded = self.entries.get(study, {}).get(group_key(files))
+        if recorded is None:
+            return False
+        if not all(os.path.exists(output_file) for output_file in output_files):
+            return False
+
+        for path in files:
+            previous = recorded.get(os.path.abspath(path))
+            if previous is None:
+                return False
+            try:
+                stat = os.stat(path)
+            except OSError:
+                return False
+            if stat.st_size != previous["size"]:
+                return False
+            if stat.st_mtime_ns != previous["mtime_ns"]:
+                if hash_file(path) != previous["sha256"]:
+                    return False
+                previous["mtime_ns"] = stat.st_mtime_ns
+                self._dirty = True
+        return True
+
+    def record(self, study, files, fingerprints):
+        """Remember that files were converted for study.
+
+        fingerprints maps each input path to fingerprint(path), taken before
+        the file was read so that a change during conversion is picked up by
+        the next run.
+        """
+        self.entries.setdefault(study, {})[group_key(files)] = {
+            os.path.abspath(path): fingerprints[path] for path in files
+        }
+        self._dirty = True
+
+    def save(self):
+        """Write the manifest if it changed, atomically."""
+        if not self._dirty:
+            return
+        write_json_atomic(self.path, {"version": MANIFEST_VERSION, "parser_version": PARSER_VERSION,
+                                      "entries": self.entries})
+        self._dirty = False
@@ -0,0 +1,107 @@
+import json
+import os
+import time
+
+from manifest import write_json_atomic
+from parsed_scan import ParsedScan
+from report_parser import PARSER_VERSION
+
+PAIRING_INDEX_NAME = "chips_pairing.json"
+PAIRING_INDEX_VERSION = 4
+# Seconds a half is kept waiting for its partner
+DEFAULT_MAX_AGE = 30 * 24 * 3600
+
+class PairingIndex:
+    """Halves of standard/numeric pairs still waiting for their partner.
+
+    Stored as chips_pairing.json next to the outputs. For every prefix whose
+    file was converted on its own, it keeps that file's path, size,
+    modification time and parsed result. When a file with the same prefix
+    turns up in a later batch, the batch engine merges it with the stored
+    result, so the earlier file is not read again and does not need to be
+    selected. A pair converted together removes its prefix. Halves are
+    stored even when their own outputs could not be written, as long as they
+    parsed.
+
+    An entry is dropped when its file has been moved, removed or changed
+    since it was parsed, and when the index is saved more than max_age
+    seconds after the entry was stored. The whole index is discarded when
+    PARSER_VERSION changes.
+    """
+
+    def __init__(self, output_dir, max_age=DEFAULT_MAX_AGE):
+        self.path = os.path.join(output_dir, PAIRING_INDEX_NAME)
+        self.max_age = max_age
+        self.entries = {}
+        self._dirty = False
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return
+        if (not isinstance(stored, dict)
+                or stored.get("version") != PAIRING_INDEX_VERSION
+                or stored.get("parser_version") != PARSER_VERSION):
+            return
+        self.entries = stored.get("entries", {})
+        now = time.time()
+        for entry in self.entries.values():
+            entry.setdefault("stored_at", now)  # Stored before entries recorded their age
+
+    def partner_for(self, prefix, file):
+        """The stored half for prefix, unless it is file itself or is out of date.
+
+        Returns a dict with the stored 'file', its report 'format' and the
+        parsed 'data' as a ParsedScan, or None.
+        """
+        entry = self.entries.get(prefix)
+        if entry is None or entry["file"] == os.path.abspath(file):
+            return None
+        try:
+            stat = os.stat(entry["file"])
+        except OSError:
+            stat = None
+        if stat is None or stat.st_size != entry["size"] or stat.st_mtime_ns != entry["mtime_ns"]:
+            self.forget(prefix)
+            return None
+        return dict(entry, data=ParsedScan.from_dict(entry["data"]))
+
+    def remember(self, prefix, file, data):
+        """Store the parsed result of a file that was converted without its partner."""
+        try:
+            stat = os.stat(file)
+        except OSError:
+            return
+        self.entries[prefix] = {"file": os.path.abspath(file), "size": stat.st_size,
+                                "mtime_ns": stat.st_mtime_ns, "format": data.report_format,
+                                "data": data.to_dict(), "stored_at": time.time()}
+        self._dirty = True
+
+    def forget(self, prefix):
+        if self.entries.pop(prefix, None) is not None:
+            self._dirty = True
+
+    def update(self, counts):
+        """Apply the 'paired' and 'unmatched' results of a process_group call."""
+        for prefix in counts.get('paired', ()):
+            self.forget(prefix)
+        for prefix, file, data in counts.get('unmatched', ()):
+            self.remember(prefix, file, data)
+
+    def expire(self):
+        """Drop the entries stored more than max_age seconds ago."""
+        cutoff = time.time() - self.max_age
+        for prefix in [prefix for prefix, entry in self.entries.items() if entry["stored_at"] < cutoff]:
+            self.forget(prefix)
+
+    def save(self):
+        """Drop expired entries, then write the index if it changed, atomically."""
+        self.expire()
+        if not self._dirty:
+            return
+        write_json_atomic(self.path, {"version": PAIRING_INDEX_VERSION, "parser_version": PARSER_VERSION,
+                                      "entries": self.entries})
+        self._dirty = False
@@ -0,0 +1,169 @@
+"""Compact parsed form of one DEXA report.
+
+parse_body_composition fills a ParsedScan and the study emitters read from
+it. Only what the emitters read is kept: the REGION_COLUMNS of each region
+in SCAN_REGIONS in one flat array of floats, with a bit mask of the cells the
+report had a value for, and TEXT_COLUMN as printed, since it is copied into
+the output verbatim. Each value is converted from text once, when the report
+is parsed, and a scan kept for the rest of a batch costs about a quarter of
+the memory of a dict of dicts of strings.
+
+A token that is not a number is stored as NaN, and get() raises ValueError
+for it like the conversion of the string used to.
+"""
+import math
+from array import array
+
+from utils import REGION_MAP
+
+# Regions the study emitters read. The parser also meets other rows, such as
+# ROIs that no study uses; they only count towards whether anything was parsed.
+SCAN_REGIONS = ("Total", "Arms", "Legs", "Trunk", "Android", "Gynoid") + tuple(REGION_MAP.values())
+# Columns the emitters read as numbers, and the one they copy as printed
+VALUE_COLUMNS = ("Region (%Fat)", "Fat (g)", "Lean (g)", "BMC (g)", "Fat Free (g)")
+TEXT_COLUMN = "Total Mass (kg)"
+# The VALUE_COLUMNS read from each region; the others are not converted or kept
+REGION_COLUMNS = dict.fromkeys(SCAN_REGIONS, ("Region (%Fat)", "Fat (g)", "Lean (g)", "Fat Free (g)"))
+REGION_COLUMNS.update({"Total": VALUE_COLUMNS, "Arms": ("Lean (g)",), "Legs": ("Lean (g)",)})
+# Read the way float() reads text, so a value with thousands separators is not a number
+PLAIN_FLOAT_COLUMN = "Region (%Fat)"
+
+_WIDTH = len(VALUE_COLUMNS)
+_ROW_INDEX = {region: row for row, region in enumerate(SCAN_REGIONS)}
+_ROW_START = {region: row * _WIDTH for row, region in enumerate(SCAN_REGIONS)}
+_COLUMN_INDEX = {column: index for index, column in enumerate(VALUE_COLUMNS)}
+_ROW_MASK = (1 << _WIDTH) - 1
+_row_layouts = {}
+
+def _row_layout(columns):
+    """Where the kept values of a row are, for a tuple of columns.
+
+    Returns, for each region in SCAN_REGIONS, ((token position, value index,
+    strip commas), ...), and the token position of TEXT_COLUMN or None. A
+    report uses one column order for all its rows, so the layout is worked
+    out once per order.
+    """
+    layout = _row_layouts.get(columns)
+    if layout is None:
+        kept = tuple(tuple((position, _COLUMN_INDEX[column], column != PLAIN_FLOAT_COLUMN)
+                           for position, column in enumerate(columns)
+                           if column in REGION_COLUMNS[region])
+                     for region in SCAN_REGIONS)
+        text = columns.index(TEXT_COLUMN) if TEXT_COLUMN in columns else None
+        layout = _row_layouts[columns] = (kept, text)
+    return layout
+
+class ParsedScan:
+    """The values parsed from one report, by region and column.
+
+    report_format is "standard" or "numeric". vat_mass is the Visceral
+    Adipose Tissue mass in grams, or None. get() and text() raise KeyError
+    for a value the report did not have, or that is not kept, like the dicts
+    the parser used to return.
+    """
+
+    __slots__ = ("report_format", "values", "present", "texts", "rows", "vat_mass",
+                 "regions_stored")
+
+    def __init__(self, report_format="standard"):
+        self.report_format = report_format
+        self.values = array('d', bytes(8 * len(SCAN_REGIONS) * _WIDTH))
+        self.present = 0  # Bit per value the report had
+        self.texts = [None] * len(SCAN_REGIONS)  # TEXT_COLUMN token per region
+        self.rows = 0  # Bit per region in SCAN_REGIONS with a row
+        self.vat_mass = None
+        self.regions_stored = 0  # Including regions outside SCAN_REGIONS
+
+    def __bool__(self):
+        return self.regions_stored > 0 or self.vat_mass is not None
+
+    def __repr__(self):
+        regions = ", ".join(region for region in SCAN_REGIONS if self.has_region(region))
+        return f"ParsedScan({self.report_format}: {regions or 'no regions'}, VAT {self.vat_mass})"
+
+    def set_region(self, region, columns, tokens):
+        """Store one table row: the value tokens as found, in the order of the columns tuple."""
+        self.regions_stored += 1
+        row = _ROW_INDEX.get(region)
+        if row is None:
+            return
+        kept, text = _row_layout(columns)
+        start = row * _WIDTH
+        values = self.values
+        present = self.present & ~(_ROW_MASK << start)
+        self.rows |= 1 << row
+        count = len(tokens)
+        for position, index, strip_commas in kept[row]:
+            if position >= count:
+                break
+            token = tokens[position]
+            if strip_commas and ',' in token:
+                token = token.replace(',', '')
+            try:
+                values[start + index] = float(token)
+            except ValueError:
+                values[start + index] = math.nan
+            present |= 1 << start + index
+        self.present = present
+        self.texts[row] = tokens[text] if text is not None and text < count else None
+
+    def has_region(self, region):
+        return bool(self.rows >> _ROW_INDEX[region] & 1)
+
+    def get(self, region, column):
+        """A value as a float; ValueError if the report printed something else."""
+        cell = _ROW_START[region] + _COLUMN_INDEX[column]
+        if not self.present >> cell & 1:
+            raise KeyError(column)
+        value = self.values[cell]
+        if value != value:
+            raise ValueError(f"could not convert {column} of {region} to float")
+        return value
+
+    def text(self, region, column=TEXT_COLUMN):
+        """A value as printed in the report; only TEXT_COLUMN is kept as text."""
+        if column != TEXT_COLUMN:
+            raise ValueError(f"Only {TEXT_COLUMN} is kept as text, not {column}")
+        token = self.texts[_ROW_INDEX[region]]
+        if token is None:
+            raise KeyError(column)
+        return token
+
+    def copy(self):
+        scan = ParsedScan(self.report_format)
+        scan.values = array('d', self.values)
+        scan.present = self.present
+        scan.texts = list(self.texts)
+        scan.rows = self.rows
+        scan.vat_mass = self.vat_mass
+        scan.regions_stored = self.regions_stored
+        return scan
+
+    def copy_region(self, other, region):
+        """Replace a region's row with the one from another scan."""
+        row = _ROW_INDEX[region]
+        start = row * _WIDTH
+        row_mask = _ROW_MASK << start
+        self.values[start:start + _WIDTH] = other.values[start:start + _WIDTH]
+        self.present = self.present & ~row_mask | other.present & row_mask
+        self.texts[row] = other.texts[row]
+        self.rows = self.rows & ~(1 << row) | other.rows & (1 << row)
+
+    def to_dict(self):
+        """Plain JSON-compatible form, for the pairing index."""
+        return {"format": self.report_format,
+                "values": [value if value == value else "NaN" for value in self.values],
+                "present": self.present, "texts": self.texts, "rows": self.rows, "vat_mass": self.vat_mass,
+                "regions_stored": self.regions_stored}
+
+    @classmethod
+    def from_dict(cls, stored):
+        scan = cls(stored["format"])
+        scan.values = array('d', (math.nan if value == "NaN" else value
+                                  for value in stored["values"]))
+        scan.present = stored["present"]
+        scan.texts = list(stored["texts"])
+        scan.rows = stored["rows"]
+        scan.vat_mass = stored["vat_mass"]
+        scan.regions_stored = stored["regions_stored"]
+        return scan
@@ -0,0 +1,61 @@
+"""Background writing of batch output.
+
+run_batch converts work items on a pool of workers, and the pool is what
+overlaps I/O with conversion: while one worker waits for its input to come
+off the disk or network share, or writes its per-file CSVs, the others keep
+converting. The combined outputs, however, are written by the loop that also
+hands out work, so WriteBehind takes those writes off it. It takes batches of
+output rows from a bounded queue and writes them, so collecting results and
+scheduling work never wait on a writer. When the queue is full the scheduler
+blocks, which caps the rows held in memory however large the batch is.
+"""
+import queue
+import threading
+
+# Batches of rows waiting to be written before the producer blocks
+WRITE_QUEUE_SIZE = 4
+
+class WriteBehind:
+    """Runs write callbacks on a background thread, fed through a bounded queue.
+
+    submit(write, *args) queues write(*args) and blocks while max_pending
+    calls are already waiting. Calls run one at a time, in order. The first
+    exception raised by a write is re-raised by the next submit() or by
+    close(), and the writes queued after it are dropped.
+    """
+
+    def __init__(self, max_pending=WRITE_QUEUE_SIZE):
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._error = None
+        self._failed = False
+        self._thread = threading.Thread(target=self._run, name="chips-write-behind", daemon=True)
+        self._thread.start()
+
+    def submit(self, write, *args):
+        self._raise_error()
+        self._queue.put((write, args))
+
+    def close(self):
+        """Wait for the queued writes to finish."""
+        self._queue.put(None)
+        self._thread.join()
+        self._raise_error()
+
+    def _raise_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            if self._failed:
+                continue  # Drain without writing, so submit() never blocks forever
+            write, args = item
+            try:
+                write(*args)
+            except Exception as e:
+                self._error = e
+                self._failed = True
@@ -0,0 +1,124 @@
+"""Throughput and ETA reporting for batch conversions.
+
+ProgressTracker counts the input files and bytes a batch has finished and
+passes a snapshot to a callback at most once per interval, however fast work
+items complete, so a GUI event loop is not flooded with updates. Rates only
+count work that was converted in this run; files skipped as up to date move
+the progress on without inflating the throughput. The ETA divides the input
+bytes still to go by the byte rate so far, since XPS exports take far longer
+than text files of the same count.
+"""
+import os
+import time
+
+# Minimum seconds between two progress updates
+PROGRESS_INTERVAL = 0.5
+
+def input_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+class ProgressTracker:
+    """Coalesces per-work-item progress into timed snapshots.
+
+    advance() records finished work and skip() records work that did not need
+    converting; both only call the callback once the interval has passed
+    since the last update. poll() lets an idle loop refresh the elapsed time
+    and ETA while work items are still running, and finish() always sends the
+    final snapshot.
+    """
+
+    def __init__(self, total_files, total_bytes, callback, interval=PROGRESS_INTERVAL):
+        self.total_files = total_files
+        self.total_bytes = total_bytes
+        self.callback = callback
+        self.interval = interval
+        self.files = 0
+        self.bytes = 0
+        self.skipped_files = 0
+        self.skipped_bytes = 0
+        self.start = time.monotonic()
+        self._last_update = None
+
+    def advance(self, files, size):
+        self.files += files
+        self.bytes += size
+        self.poll()
+
+    def skip(self, files, size):
+        self.skipped_files += files
+        self.skipped_bytes += size
+        self.poll()
+
+    def poll(self):
+        now = time.monotonic()
+        if self._last_update is None or now - self._last_update >= self.interval:
+            self._update(now)
+
+    def finish(self):
+        self._update(time.monotonic())
+
+    def _update(self, now):
+        self._last_update = now
+        self.callback(self.snapshot(now))
+
+    def snapshot(self, now=None):
+        """Progress so far as a dict of plain numbers (times in seconds)."""
+        elapsed = (now if now is not None else time.monotonic()) - self.start
+        processed = self.files + self.skipped_files
+        processed_bytes = self.bytes + self.skipped_bytes
+        files_per_second = self.files / elapsed if elapsed > 0 else 0.0
+        bytes_per_second = self.bytes / elapsed if elapsed > 0 else 0.0
+        remaining_bytes = max(0, self.total_bytes - processed_bytes)
+        if processed >= self.total_files:
+            eta = 0.0
+        elif bytes_per_second > 0:
+            eta = remaining_bytes / bytes_per_second
+        else:
+            eta = None
+        if self.total_bytes:
+            fraction = processed_bytes / self.total_bytes
+        else:
+            fraction = processed / self.total_files if self.total_files else 1.0
+        return {
+            "processed": processed,
+            "total": self.total_files,
+            "skipped": self.skipped_files,
+            "bytes": processed_bytes,
+            "total_bytes": self.total_bytes,
+            "percent": min(100, int(fraction * 100)),
+            "elapsed": elapsed,
+            "files_per_second": files_per_second,
+            "bytes_per_second": bytes_per_second,
+            "eta": eta,
+        }
+
+def format_duration(seconds):
+    if seconds is None:
+        return "--:--"
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+def format_bytes(size):
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+def format_progress(snapshot):
+    """One-line human-readable form of a progress snapshot."""
+    return (f"{snapshot['processed']}/{snapshot['total']} files ({snapshot['percent']}%), "
+            f"{snapshot['files_per_second']:.1f} files/s, "
+            f"{format_bytes(snapshot['bytes_per_second'])}/s, "
+            f"elapsed {format_duration(snapshot['elapsed'])}, "
+            f"ETA {format_duration(snapshot['eta'])}")
+
+def format_throughput(snapshot):
+    """Summary line for the final snapshot of a batch."""
+    return (f"Throughput: {snapshot['files_per_second']:.1f} files/s, "
+            f"{format_bytes(snapshot['bytes_per_second'])}/s "
+            f"in {format_duration(snapshot['elapsed'])}")
@@ -0,0 +1,137 @@
+import re
+from chips_logging import get_logger, trace_debug
+from parsed_scan import ParsedScan
+from utils import (POSSIBLE_DEXA_FILE_COLUMNS, REGION_MAP, STANDARD_ANCHOR, NUMERIC_ANCHOR,
+                   VAT_PATTERN)
+
+VAT_PHRASE = "Estimated Visceral Adipose Tissue"
+
+# Bump whenever parsing or the study output rows change, so incremental runs
+# (see manifest.py) convert every input again.
+PARSER_VERSION = "1"
+
+log = get_logger("parser")
+
+_VALUE_PATTERN = re.compile(r'[-\d,.]+')
+_DIGIT_PATTERN = re.compile(r'\d')
+
+def _has_digit(line):
+    """Equivalent to any(char.isdigit() for char in line), without a Python-level loop.
+
+    \\d only covers decimal digits, while str.isdigit also accepts characters
+    such as superscripts ("cm³"), so non-ASCII lines fall back to the slow check.
+    """
+    if _DIGIT_PATTERN.search(line):
+        return True
+    return not line.isascii() and any(char.isdigit() for char in line)
+
+def column_order(content):
+    """POSSIBLE_DEXA_FILE_COLUMNS as a tuple, sorted by where they first appear in the report.
+
+    Whitespace is ignored because column headers are often split over lines.
+    Columns that do not appear keep their relative order at the end.
+    """
+    clean_content = ''.join(content.split())
+
+    def find_column_index(col):
+        index = clean_content.find(''.join(col.split()))
+        return index if index != -1 else float('inf')
+
+    return tuple(sorted(POSSIBLE_DEXA_FILE_COLUMNS, key=find_column_index))
+
+def parse_body_composition(content):
+    """Parse the body composition table of a DEXA report.
+
+    Walks the report once from its anchor, collecting region rows and the
+    Visceral Adipose Tissue block in the same pass. Returns a ParsedScan, or
+    None if nothing could be parsed.
+    """
+    trace_debug(log, "Starting to parse the file content")
+
+    # Check for both possible starting points
+    standard_start = content.find(STANDARD_ANCHOR)
+    numeric_start = content.find(NUMERIC_ANCHOR)
+
+    if standard_start != -1:
+        content = content[standard_start:]
+        trace_debug(log, "Found standard format starting point")
+    elif numeric_start != -1:
+        content = content[numeric_start:]
+        trace_debug(log, "Found numeric format starting point")
+    else:
+        log.warning("Could not find either starting point in the file")
+        return None
+
+    # Reorder columns based on their appearance in the content
+    columns = column_order(content)
+
+    current_region = None
+    current_values = []
+    using_numeric = numeric_start != -1
+    scan = ParsedScan("numeric" if using_numeric else "standard")
+    vat_mass = None
+
+    def store_region(final=False):
+        region_key = current_region
+        if using_numeric and current_region in REGION_MAP:
+            region_key = REGION_MAP[current_region]
+        scan.set_region(region_key, columns, current_values)
+        trace_debug(log, "Stored %sdata for region %s: %s", "final " if final else "", region_key,
+                    current_values)
+
+    trace_debug(log, "Parsing lines (format: %s)", "Numeric" if using_numeric else "Descriptive")
+    line_start = 0
+    content_length = len(content)
+    is_header = True
+    while line_start <= content_length:
+        line_end = content.find('\n', line_start)
+        if line_end == -1:
+            line_end = content_length
+        raw_line = content[line_start:line_end]
+
+        # The VAT block spans several lines; match it in place from its
+        # first line instead of searching the whole report afterwards.
+        if vat_mass is None and VAT_PHRASE in raw_line:
+            phrase_at = content.find(VAT_PHRASE, line_start, line_end)
+            while phrase_at != -1 and vat_mass is None:
+                vat_match = VAT_PATTERN.match(content, phrase_at)
+                if vat_match:
+                    vat_mass = vat_match.group(1)
+                phrase_at = content.find(VAT_PHRASE, phrase_at + 1, line_end)
+
+        line_start = line_end + 1
+        if is_header:  # Skip the header line
+            is_header = False
+            continue
+
+        line = raw_line.strip()
+        if not line or line.startswith("Fat Mass Ratios:"):
+            continue
+
+        trace_debug(log, "Processing line: %s", line)
+
+        # Check if this line is a new region
+        if not _has_digit(line) or (using_numeric and line in REGION_MAP):
+            if current_region and len(current_values) == 8:
+                store_region()
+            current_region = line.replace('(e)', '').strip()
+            current_values = []
+        else:
+            # This line contains numeric data
+            current_values.extend(_VALUE_PATTERN.findall(line))
+
+    # Store the last region if it's complete
+    if current_region and len(current_values) == len(columns):
+        store_region(final=True)
+
+    # Extract Visceral Adipose Tissue Mass if present
+    if vat_mass is not None:
+        scan.vat_mass = float(vat_mass)
+        trace_debug(log, "Extracted Visceral Fat Mass: %s g", vat_mass)
+
+    if not scan:
+        log.warning("No data was parsed from the file")
+        return None
+
+    trace_debug(log, "Parsed data structure: %s", scan)
+    return scan
@@ -0,0 +1,110 @@
+"""Splitting exports that hold several reports.
+
+Some scanner exports put many patients' reports into one text or XPS file.
+Every report starts at a report anchor (STANDARD_ANCHOR or NUMERIC_ANCHOR)
+and runs up to the start of the next report or the end of the export. A
+standard report may carry a custom ROI table after its VAT block, so a
+numeric anchor only starts a new report when the current one did not start
+at a standard anchor; the parser reads such a report as one. The functions here
+walk an export anchor by anchor and yield the text of one report at a time,
+so memory use depends on the size of a report rather than of the export. For
+an export holding a single report they yield the same text the parsers have
+always been given.
+"""
+import codecs
+import mmap
+import os
+
+from utils import REPORT_ANCHORS, REPORT_ANCHOR_BYTES, decode_report_bytes, iter_xps_pages
+
+def anchor_starts(haystack, anchors=REPORT_ANCHORS):
+    """Yield (offset, anchor index) for every anchor in haystack, in order.
+
+    haystack is anything with a str-like find(), such as a str or an mmap
+    (with byte anchors). Each anchor is only searched for again once the
+    scan has passed its last match, so the export is scanned once per anchor.
+    """
+    positions = [haystack.find(anchor) for anchor in anchors]
+    while True:
+        found = [position for position in positions if position != -1]
+        if not found:
+            return
+        start = min(found)
+        yield start, positions.index(start)
+        positions = [haystack.find(anchor, start + 1) if position == start else position
+                     for anchor, position in zip(anchors, positions)]
+
+def starts_report(index, in_standard):
+    """Whether the anchor with this index starts a new report.
+
+    in_standard tells whether the current report started at a standard
+    anchor (index 0), in which case a numeric anchor continues it.
+    """
+    return index == 0 or not in_standard
+
+def report_starts(haystack, anchors=REPORT_ANCHORS):
+    """Yield the offset at which each report in haystack starts."""
+    in_standard = False
+    for start, index in anchor_starts(haystack, anchors):
+        if starts_report(index, in_standard):
+            in_standard = index == 0
+            yield start
+
+def split_reports(text):
+    """Yield each report in text; text before the first anchor is dropped."""
+    starts = report_starts(text)
+    start = next(starts, None)
+    while start is not None:
+        end = next(starts, None)
+        yield text[start:end]
+        start = end
+
+def iter_text_reports(text_file):
+    """Yield each report of a text export.
+
+    The file is memory-mapped and searched byte-wise, and only one report is
+    decoded at a time (see utils.decode_report_bytes). UTF-16 exports are
+    decoded as a whole, since their anchors cannot be found byte-wise. The
+    file is closed when the generator finishes or is closed.
+    """
+    with open(text_file, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if data[:2] in (codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE):
+                text = data[:].decode('utf-16').replace('\r\n', '\n').replace('\r', '\n')
+                yield from split_reports(text)
+                return
+            starts = report_starts(data, REPORT_ANCHOR_BYTES)
+            start = next(starts, None)
+            while start is not None:
+                end = next(starts, None)
+                with memoryview(data) as view:
+                    report = decode_report_bytes(view[start:end])
+                yield report
+                start = end
+
+def iter_xps_reports(xps_file):
+    """Yield each report of an XPS export, extracting it page by page.
+
+    Unlike utils.xps_report_text, this reads the export to its last page, so
+    only the pages of the report being assembled are held in memory.
+    """
+    pending = None  # Page texts of the current report
+    in_standard = False
+    for page in iter_xps_pages(xps_file):
+        page += "\n\n"
+        position = 0
+        for start, index in anchor_starts(page):
+            if not starts_report(index, in_standard):
+                continue
+            in_standard = index == 0
+            if pending is not None:
+                pending.append(page[position:start])
+                yield "".join(pending)
+            pending = []
+            position = start
+        if pending is not None:
+            pending.append(page[position:])
+    if pending is not None:
+        yield "".join(pending)
@@ -0,0 +1,12 @@
+import os
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURE_DIR = os.path.join(REPO_DIR, "benchmarks", "fixtures")
+
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, "benchmarks"))
+
+def read_fixture(report_format):
+    with open(os.path.join(FIXTURE_DIR, f"{report_format}.txt"), 'r', encoding='utf-8') as f:
+        return f.read()
@@ -0,0 +1,60 @@
+"""Counts reported by run_batch for pairs merged within and across batches."""
+from batch_engine import run_batch
+from conftest import read_fixture
+
+def write_report(directory, name, report_format):
+    path = directory / name
+    path.write_text(read_fixture(report_format), encoding='utf-8')
+    return str(path)
+
+def test_pairs_within_and_across_batches(tmp_path):
+    input_dir = tmp_path / "in"
+    output_dir = tmp_path / "out"
+    input_dir.mkdir()
+    output_dir.mkdir()
+    first = [write_report(input_dir, "100_body.txt", "standard"),
+             write_report(input_dir, "100_roi.txt", "numeric"),
+             write_report(input_dir, "200_body.txt", "standard")]
+
+    results = run_batch(first, str(output_dir), ["Cuirass"], max_workers=1)
+    assert (results['success'], results['merged'], results['merged_with_earlier']) == (3, 1, 0)
+
+    later = [write_report(input_dir, "200_roi.txt", "numeric")]
+    results = run_batch(later, str(output_dir), ["Cuirass"], max_workers=1)
+    assert (results['success'], results['merged'], results['merged_with_earlier']) == (1, 0, 1)
+    assert (output_dir / "200_merged_output.csv").exists()
+
+def test_halves_that_fail_alone_are_still_paired_later(tmp_path):
+    input_dir = tmp_path / "in"
+    output_dir = tmp_path / "out"
+    input_dir.mkdir()
+    output_dir.mkdir()
+
+    # FUVID cannot convert a numeric report on its own
+    first = [write_report(input_dir, "100_roi.txt", "numeric")]
+    results = run_batch(first, str(output_dir), ["FUVID"], max_workers=1)
+    assert (results['success'], results['errors']) == (0, 1)
+
+    later = [write_report(input_dir, "100_body.txt", "standard")]
+    results = run_batch(later, str(output_dir), ["FUVID"], max_workers=1)
+    assert (results['success'], results['merged_with_earlier']) == (1, 1)
+
+def test_moved_halves_and_disabled_pairing_are_not_merged(tmp_path):
+    input_dir = tmp_path / "in"
+    output_dir = tmp_path / "out"
+    input_dir.mkdir()
+    output_dir.mkdir()
+    body = write_report(input_dir, "100_body.txt", "standard")
+    write_report(input_dir, "200_body.txt", "standard")
+    run_batch([body, str(input_dir / "200_body.txt")], str(output_dir), ["Cuirass"], max_workers=1)
+
+    (input_dir / "100_body.txt").rename(input_dir / "100_body_archived.txt")
+    later = [write_report(input_dir, "100_roi.txt", "numeric")]
+    results = run_batch(later, str(output_dir), ["Cuirass"], max_workers=1)
+    assert (results['success'], results['merged_with_earlier']) == (1, 0)
+
+    later = [write_report(input_dir, "200_roi.txt", "numeric")]
+    results = run_batch(later, str(output_dir), ["Cuirass"], max_workers=1,
+                        pair_across_batches=False)
+    assert (results['success'], results['merged_with_earlier']) == (1, 0)
+    assert not (output_dir / "200_merged_output.csv").exists()
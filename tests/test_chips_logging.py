@@ -0,0 +1,52 @@
+"""Console output of records logged inside file traces."""
+import io
+
+import pytest
+
+from chips_logging import configure_logging, file_trace, get_logger, trace_debug
+
+log = get_logger("test")
+
+@pytest.fixture
+def console():
+    stream = io.StringIO()
+    configure_logging("WARNING", stream=stream)
+    yield stream
+    configure_logging()
+
+def test_records_at_console_level_are_written_from_successful_files(console):
+    with file_trace("300_a.txt"):
+        log.warning("not a pair")
+        log.info("parsed")
+    output = console.getvalue()
+    assert "not a pair" in output
+    assert "[300_a.txt]" in output
+    assert "parsed" not in output
+
+def test_failed_files_add_the_records_below_the_console_level(console):
+    with file_trace("300_a.txt") as trace:
+        log.info("parsed")
+        log.warning("not a pair")
+        trace.fail()
+    lines = console.getvalue().splitlines()
+    assert len(lines) == 3
+    assert "not a pair" in lines[0]
+    assert "Processing failed" in lines[1]
+    assert "parsed" in lines[2]
+
+def test_failed_files_add_trace_debug_messages_at_any_console_level(console):
+    with file_trace("300_a.txt") as trace:
+        trace_debug(log, "Processing line: %s", "Trunk 1 2 3")
+        trace.fail()
+    lines = console.getvalue().splitlines()
+    assert len(lines) == 2
+    assert "Processing failed, trace of the last 1 records" in lines[0]
+    assert "DEBUG chips.test [300_a.txt] Processing line: Trunk 1 2 3" in lines[1]
+
+def test_failed_files_with_an_empty_trace_add_nothing(console):
+    with file_trace("300_a.txt") as trace:
+        log.error("No report found")
+        trace.fail()
+    lines = console.getvalue().splitlines()
+    assert len(lines) == 1
+    assert "No report found" in lines[0]
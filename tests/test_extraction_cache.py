@@ -0,0 +1,25 @@
+"""Worker copies of the cache leave size tracking to the original."""
+import pickle
+
+from extraction_cache import ExtractionCache
+
+def test_copies_report_written_bytes_without_scanning(tmp_path, monkeypatch):
+    cache = ExtractionCache(str(tmp_path), max_bytes=1000)
+    scans = []
+    scan_size = ExtractionCache._scan_size
+
+    def counting_scan(self):
+        scans.append(self)
+        return scan_size(self)
+
+    monkeypatch.setattr(ExtractionCache, "_scan_size", counting_scan)
+
+    for n in range(30):
+        # process_group gets a fresh copy of the cache for every task
+        copy = pickle.loads(pickle.dumps(cache))
+        copy.put(f"{n:064x}", "x" * 100)
+        assert copy.untracked_bytes == 100
+        cache.add_size(copy.untracked_bytes)
+
+    assert scans == [cache]
+    assert sum(1 for _ in cache._entries()) <= 10
@@ -0,0 +1,34 @@
+"""The row-by-row and array paths of the formula engine give the same output."""
+import random
+
+import cuirass_processor
+from formulas import MIN_ARRAY_ROWS
+
+VALUES = ["", "ERROR", "0", "0.0", "-0.0", "nan", "inf", "1e308", "-1e308", "12.5", "0.005"]
+
+def random_rows(count, seed=0):
+    rng = random.Random(seed)
+    engine = cuirass_processor.FORMULA_ENGINE
+    rows = []
+    for _ in range(count):
+        rows.append({column: rng.choice(VALUES + [str(round(rng.uniform(-50, 80), rng.randint(0, 4)))])
+                     for column in engine.input_columns})
+    return rows
+
+def test_single_rows_match_array_evaluation():
+    rows = random_rows(5000)
+    batch = [dict(row) for row in rows]
+    cuirass_processor.apply_formulas(batch)
+    assert len(batch) >= MIN_ARRAY_ROWS
+    for row, expected in zip(rows, batch):
+        single = dict(row)
+        cuirass_processor.apply_formulas([single])
+        assert single == expected
+
+def test_single_row_formulas():
+    row = {"Total Lean Arms kg": "7.937", "Total Lean Legs kg": "16.815", "Trunk Fat kg": "12.243",
+           "Total Fat kg": "0"}
+    cuirass_processor.apply_formulas([row])
+    assert row["ASMM kg"] == 24.752
+    assert row["Trunk Fat Perc BodyFat"] == "ERROR"
+    assert row["ROI Chest Wall Fat kg"] == "ERROR"
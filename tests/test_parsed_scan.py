@@ -0,0 +1,125 @@
+"""ParsedScan gives the study emitters the same rows as the dicts of strings it replaced.
+
+The golden digests in data/parsed_scan_golden.json were recorded with the
+dict-based parser, over generated reports, mutations of them and merges.
+"""
+import hashlib
+import json
+import os
+import random
+
+import pytest
+
+import cuirass_processor
+import fuvid_processor
+from corpus import standard_report, numeric_report
+from conftest import read_fixture
+from parsed_scan import ParsedScan, TEXT_COLUMN
+from report_parser import parse_body_composition
+from utils import merge_data
+
+GOLDEN_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "parsed_scan_golden.json")
+CHUNK_SIZE = 100
+
+REPLACEMENT_LINES = ["Total", "Arms", "1", "2", "3", "Android (e)", "ROI Rib", "12.5 13", "-", "1,234.50"]
+
+def report_texts(seed=0, patients=60):
+    rng = random.Random(seed)
+    texts = [read_fixture("standard"), read_fixture("numeric")]
+    for patient in range(patients):
+        texts.append(standard_report(rng, f"P{patient}"))
+        texts.append(numeric_report(rng, f"P{patient}"))
+    return texts
+
+def mutated_texts(texts, count, seed=1):
+    """Reports with lines dropped, repeated, garbled or replaced."""
+    rng = random.Random(seed)
+    mutated = []
+    for _ in range(count):
+        lines = rng.choice(texts).split('\n')
+        for _ in range(rng.randint(1, 6)):
+            op = rng.random()
+            index = rng.randrange(len(lines))
+            if op < 0.25 and len(lines) > 1:
+                del lines[index]
+            elif op < 0.5:
+                lines.insert(index, rng.choice(lines))
+            elif op < 0.7:
+                lines[index] = lines[index].replace(rng.choice("0123456789.,"),
+                                                    rng.choice(["", ".", ",", "-", "x", "7", ".00"]))
+            elif op < 0.85:
+                lines[index] = rng.choice(REPLACEMENT_LINES)
+            else:
+                lines[index] += f" {rng.uniform(0, 20000):,.2f}"
+        mutated.append('\n'.join(lines))
+    return mutated
+
+def emitted(data):
+    """The rows both studies build from parsed data, or the errors they raise."""
+    if data is None:
+        return None
+    rows = []
+    for processor in (cuirass_processor, fuvid_processor):
+        try:
+            rows.append(processor.build_output_row(data, with_formulas=False))
+        except Exception as e:
+            rows.append(type(e).__name__)
+    return rows
+
+def case_results(merges=400, seed=2):
+    texts = report_texts()
+    texts += mutated_texts(texts, 1500)
+    parsed = [parse_body_composition(text) for text in texts]
+    results = [emitted(data) for data in parsed]
+    rng = random.Random(seed)
+    for _ in range(merges):
+        results.append(emitted(merge_data(rng.choice(parsed), rng.choice(parsed))))
+    return results
+
+def chunk_digests(results):
+    return [hashlib.sha256(json.dumps(results[start:start + CHUNK_SIZE], sort_keys=True).encode()).hexdigest()
+            for start in range(0, len(results), CHUNK_SIZE)]
+
+def test_rows_match_dict_parser():
+    with open(GOLDEN_FILE, 'r', encoding='utf-8') as f:
+        golden = json.load(f)
+    results = case_results()
+    assert len(results) == golden["cases"]
+    assert chunk_digests(results) == golden["digests"]
+
+@pytest.fixture
+def scan():
+    data = parse_body_composition(read_fixture("standard"))
+    assert data is not None
+    return data
+
+def test_missing_and_unkept_values_raise_key_error(scan):
+    with pytest.raises(KeyError):
+        scan.get("ROI Rib", "Fat (g)")
+    with pytest.raises(KeyError):
+        scan.get("Total", "Tissue (g)")
+    with pytest.raises(KeyError):
+        scan.get("Arms", "Fat (g)")  # Not read by any study
+
+def test_values_are_floats_and_mass_is_text(scan):
+    assert isinstance(scan.get("Total", "Fat (g)"), float)
+    assert isinstance(scan.text("Total"), str)
+    with pytest.raises(ValueError):
+        scan.text("Total", "Fat (g)")
+
+def test_thousands_separators():
+    columns = ("Region (%Fat)", "Fat (g)", TEXT_COLUMN)
+    data = ParsedScan()
+    data.set_region("Total", columns, ["1,2", "12,345.6", "70,1"])
+    assert data.get("Total", "Fat (g)") == 12345.6
+    with pytest.raises(ValueError):
+        data.get("Total", "Region (%Fat)")  # float() does not take separators
+    assert data.text("Total") == "70,1"
+
+def test_dict_round_trip(scan):
+    scan.set_region("Trunk", ("Region (%Fat)", "Fat (g)"), ["x", "1"])
+    restored = ParsedScan.from_dict(json.loads(json.dumps(scan.to_dict())))
+    assert emitted(restored) == emitted(scan)
+    assert restored.get("Trunk", "Fat (g)") == 1.0
+    with pytest.raises(ValueError):
+        restored.get("Trunk", "Region (%Fat)")
@@ -0,0 +1,96 @@
+"""Splitting exports into reports, including a standard report followed by its ROI table."""
+import csv
+import os
+
+import pytest
+
+from batch_engine import process_single_file, read_single_report
+from conftest import read_fixture
+from report_splitter import iter_text_reports, split_reports
+from utils import NUMERIC_ANCHOR, STANDARD_ANCHOR
+
+STUDIES = ["Cuirass", "FUVID"]
+
+def combined_report():
+    """A standard report with a custom ROI table after its VAT block."""
+    return read_fixture("standard") + read_fixture("numeric")
+
+def write_text(path, text):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    return str(path)
+
+def read_rows(path):
+    with open(path, newline='') as f:
+        return list(csv.DictReader(f))
+
+def test_combined_report_is_not_split():
+    reports = list(split_reports(combined_report()))
+    assert len(reports) == 1
+    assert reports[0].startswith(STANDARD_ANCHOR)
+    assert NUMERIC_ANCHOR in reports[0]
+
+def test_every_standard_anchor_starts_a_report():
+    text = combined_report() + read_fixture("standard")
+    assert [report.startswith(STANDARD_ANCHOR) for report in split_reports(text)] == [True, True]
+
+def test_numeric_reports_are_split():
+    text = read_fixture("numeric") * 2 + read_fixture("standard")
+    starts = [report[:len(NUMERIC_ANCHOR)] for report in split_reports(text)]
+    assert starts == [NUMERIC_ANCHOR, NUMERIC_ANCHOR, STANDARD_ANCHOR[:len(NUMERIC_ANCHOR)]]
+
+def test_text_export_matches_split_reports(tmp_path):
+    text = combined_report() * 2
+    path = write_text(tmp_path / "export.txt", text)
+    assert list(iter_text_reports(path)) == list(split_reports(text))
+
+def test_combined_report_converts_to_one_complete_row(tmp_path):
+    path = write_text(tmp_path / "300_combo.txt", combined_report())
+    assert read_single_report(path) is not None
+    assert process_single_file(path, str(tmp_path / "out"), STUDIES)
+
+    row, = read_rows(tmp_path / "out" / "Cuirass" / "300_combo_output.csv")
+    for column in ("Total Fat kg", "ROI Rib Fat kg", "ROI Abdomen Fat kg", "ASMM kg",
+                   "Visceral Fat Of Android Region kg"):
+        assert row[column] not in ("", "ERROR"), column
+    row, = read_rows(tmp_path / "out" / "FUVID" / "300_combo_output.csv")
+    assert row["ROI Rib Fat kg"] == "3.868"
+
+def xps_report_pages(tmp_path, pages, monkeypatch):
+    """The text xps_report_text returns for pages, and the number of pages it extracted."""
+    pytest.importorskip("fitz")
+    import utils
+    from xps_writer import write_xps
+
+    path = str(tmp_path / "300_export.xps")
+    write_xps(path, pages)
+    extracted = []
+    iter_xps_pages = utils.iter_xps_pages
+
+    def counting_pages(xps_file):
+        for text in iter_xps_pages(xps_file):
+            extracted.append(text)
+            yield text
+
+    monkeypatch.setattr(utils, "iter_xps_pages", counting_pages)
+    return utils.xps_report_text(path), len(extracted)
+
+def test_xps_keeps_roi_table_on_page_after_vat(tmp_path, monkeypatch):
+    from xps_writer import report_pages
+
+    pages = (report_pages(read_fixture("standard"), trailing_pages=0)
+             + report_pages(read_fixture("numeric"), trailing_pages=30)[1:])
+    text, extracted = xps_report_pages(tmp_path, pages, monkeypatch)
+    assert NUMERIC_ANCHOR in text
+    assert split_reports(text).__next__() == text[text.find(STANDARD_ANCHOR):]
+    assert extracted == 3
+
+def test_xps_stops_after_page_following_vat(tmp_path, monkeypatch):
+    from xps_writer import report_pages
+
+    pages = report_pages(read_fixture("standard"), trailing_pages=30)
+    pages += report_pages(read_fixture("numeric"))[1:]
+    text, extracted = xps_report_pages(tmp_path, pages, monkeypatch)
+    assert NUMERIC_ANCHOR not in text
+    assert "Reference curve point" not in text
+    assert extracted == 3
@@ -0,0 +1,63 @@
+"""The watcher batches its state writes, and stored halves expire."""
+import json
+import os
+
+import manifest
+import pairing_index
+import watcher
+from conftest import read_fixture
+from manifest import Manifest, MANIFEST_NAME
+from pairing_index import PairingIndex, PAIRING_INDEX_NAME
+from report_parser import parse_body_composition
+
+def test_state_is_written_once_per_interval(tmp_path, monkeypatch):
+    input_dir = tmp_path / "in"
+    output_dir = tmp_path / "out"
+    input_dir.mkdir()
+    output_dir.mkdir()
+    scans = 12
+    for prefix in range(100, 100 + scans):
+        (input_dir / f"{prefix}_body.txt").write_text(read_fixture("standard"), encoding='utf-8')
+
+    write_json_atomic = manifest.write_json_atomic
+    writes = []
+
+    def counting_write(path, data):
+        writes.append(os.path.basename(path))
+        write_json_atomic(path, data)
+
+    monkeypatch.setattr(manifest, "write_json_atomic", counting_write)
+    monkeypatch.setattr(pairing_index, "write_json_atomic", counting_write)
+    monkeypatch.setattr(watcher, "SAVE_INTERVAL", 3600.0)
+
+    results = []
+
+    def on_result(prefix, files, counts):
+        results.append(counts)
+        if len(results) == scans:
+            folder_watcher.stop()
+
+    # Halves without a partner are converted alone straight away
+    folder_watcher = watcher.FolderWatcher(str(input_dir), str(output_dir), ["Cuirass"],
+                                           settle_time=0, pair_timeout=0, poll_interval=0.01,
+                                           use_inotify=False, on_result=on_result)
+    folder_watcher.run()
+
+    assert all(counts['success'] == 1 for counts in results)
+    assert sorted(writes) == [MANIFEST_NAME, PAIRING_INDEX_NAME]
+    with open(output_dir / PAIRING_INDEX_NAME, 'r', encoding='utf-8') as f:
+        assert len(json.load(f)["entries"]) == scans
+    assert len(Manifest(str(output_dir)).entries["Cuirass"]) == scans
+
+def test_pairing_entries_expire(tmp_path):
+    report = tmp_path / "100_body.txt"
+    report.write_text(read_fixture("standard"), encoding='utf-8')
+    data = parse_body_composition(read_fixture("standard"))
+
+    index = PairingIndex(str(tmp_path), max_age=60)
+    index.remember("100", str(report), data)
+    index.remember("101", str(report), data)
+    index.entries["100"]["stored_at"] -= 120
+    index.save()
+
+    assert set(PairingIndex(str(tmp_path)).entries) == {"101"}
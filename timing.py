@@ -0,0 +1,114 @@
+"""Per-stage timing of batch conversions.
+
+Every work item (a file, or a merged pair) is timed per stage in the worker
+that converts it. The batch engine collects these into a TimingReport, which
+summarises each stage (total, p50, p95, max), keeps the slowest work items
+and is written as chips_timing.json next to the outputs.
+"""
+import contextlib
+import heapq
+import json
+import os
+import time
+
+TIMING_REPORT_NAME = "chips_timing.json"
+
+# Stages in pipeline order: reading or extracting the input text, parsing it,
+# merging a pair, building the output rows, computing derived columns and
+# writing the outputs.
+STAGES = ("extract", "parse", "merge", "build", "formulas", "write")
+
+SLOWEST_COUNT = 10
+
+class StageTimer:
+    """Accumulates wall time per stage for one work item."""
+
+    def __init__(self):
+        self.stages = {}
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+class TimingReport:
+    """Per-stage timing statistics for a batch.
+
+    add() takes the stage times of one work item. Stages that are timed once
+    for the whole batch rather than per item, such as formulas computed over
+    many rows at once or the combined output writers, are added with
+    add_batch() and count towards the stage totals only.
+    """
+
+    def __init__(self, slowest_count=SLOWEST_COUNT):
+        self.samples = {stage: [] for stage in STAGES}
+        self.batch_totals = {stage: 0.0 for stage in STAGES}
+        self.slowest_count = slowest_count
+        self.items = 0
+        self._slowest = []  # min-heap of (total, sequence, label, stages)
+
+    def add(self, label, stages):
+        for stage, seconds in stages.items():
+            self.samples.setdefault(stage, []).append(seconds)
+        total = sum(stages.values())
+        entry = (total, self.items, label, stages)
+        if len(self._slowest) < self.slowest_count:
+            heapq.heappush(self._slowest, entry)
+        elif total > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, entry)
+        self.items += 1
+
+    def add_batch(self, stage, seconds):
+        self.batch_totals[stage] = self.batch_totals.get(stage, 0.0) + seconds
+
+    def summary(self, elapsed=None):
+        """Totals and percentiles per stage, in seconds, plus the slowest work items."""
+        stages = {}
+        for stage, values in self.samples.items():
+            batch_total = self.batch_totals.get(stage, 0.0)
+            if not values and not batch_total:
+                continue
+            ordered = sorted(values)
+            stages[stage] = {
+                "total": sum(ordered) + batch_total,
+                "count": len(ordered),
+                "p50": percentile(ordered, 0.50),
+                "p95": percentile(ordered, 0.95),
+                "max": ordered[-1] if ordered else 0.0,
+            }
+        return {
+            "elapsed": elapsed,
+            "items": self.items,
+            "stages": stages,
+            "slowest": [
+                {"files": label, "total": total, "stages": item_stages}
+                for total, _, label, item_stages in sorted(self._slowest, reverse=True)
+            ],
+        }
+
+def write_timing_report(summary, output_dir):
+    path = os.path.join(output_dir, TIMING_REPORT_NAME)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2)
+    return path
+
+def format_timing_summary(summary, slowest=3):
+    """Human-readable lines for a TimingReport summary."""
+    lines = []
+    for stage, stats in summary["stages"].items():
+        lines.append(f"{stage.capitalize()}: {stats['total']:.2f} s total, "
+                     f"p50 {stats['p50'] * 1000:.1f} ms, p95 {stats['p95'] * 1000:.1f} ms, "
+                     f"max {stats['max'] * 1000:.1f} ms")
+    for item in summary["slowest"][:slowest]:
+        lines.append(f"Slow: {item['files']} ({item['total'] * 1000:.0f} ms)")
+    return lines
@@ -1,21 +1,87 @@
-import fitz
 import re
 import os
 
 def str_to_float(s):
     return float(s.replace(',', ''))
 
+def iter_xps_pages(xps_file):
+    """Yield the text of each page of an XPS file, one page at a time."""
+    # fitz takes a noticeable part of start-up, so it is imported on first use
+    import fitz
+    with fitz.open(xps_file) as doc:
+        for page in doc:
+            yield page.get_text()
+
+def iter_report_pages(xps_file):
+    """Yield only the pages of an XPS file that the parsers need.
+
+    Pages before the first one containing a report anchor are skipped, and
+    extraction stops at the page holding the Visceral Adipose Tissue block
+    that follows the standard anchor. Only the page after it is extracted as
+    well, and yielded if a custom ROI table (NUMERIC_ANCHOR) starts on it, as
+    the parser reads that table as part of the same report. Reports with a
+    numeric anchor are read from there to the end of the document.
+    """
+    found_anchor = False
+    found_standard = False
+    found_numeric = False
+    after_vat = False
+    for text in iter_xps_pages(xps_file):
+        if not found_anchor:
+            if not any(anchor in text for anchor in REPORT_ANCHORS):
+                continue
+            found_anchor = True
+        if after_vat:
+            numeric_at = text.find(NUMERIC_ANCHOR)
+            standard_at = text.find(STANDARD_ANCHOR)
+            if numeric_at != -1 and not -1 < standard_at < numeric_at:
+                yield text
+            return
+        yield text
+
+        found_numeric = found_numeric or NUMERIC_ANCHOR in text
+        vat_search_start = 0
+        if not found_standard:
+            vat_search_start = text.find(STANDARD_ANCHOR)
+            found_standard = vat_search_start != -1
+        if found_standard and not found_numeric and VAT_PATTERN.search(text, vat_search_start):
+            after_vat = True
+
 def xps_to_text(xps_file):
     try:
-        doc = fitz.open(xps_file)
-        text = ""
-        for page_num in range(doc.page_count):
-            page = doc.load_page(page_num)
-            text += page.get_text() + "\n\n"
-        return text
+        return "".join(text + "\n\n" for text in iter_xps_pages(xps_file))
+    except Exception as e:
+        raise Exception(f"Error converting XPS to text: {str(e)}")
+
+def xps_report_text(xps_file):
+    """Like xps_to_text, but only extracts the pages holding the report."""
+    try:
+        return "".join(text + "\n\n" for text in iter_report_pages(xps_file))
     except Exception as e:
         raise Exception(f"Error converting XPS to text: {str(e)}")
 
+def decode_report_bytes(data):
+    """Decode report text as UTF-8, falling back to Windows-1252, with newlines normalised."""
+    try:
+        text = str(data, 'utf-8')
+    except UnicodeDecodeError:
+        text = str(data, 'cp1252', 'replace')
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return text
+
+def text_report_text(text_file):
+    """Return the part of a text export that the parsers read.
+
+    That is the text from the first report anchor to the end, or an empty
+    string for files without an anchor. It is read report by report with
+    report_splitter.iter_text_reports, the way the batch engine reads text
+    exports, so only the reports are ever decoded.
+    """
+    # report_splitter imports this module, so it is imported on first use
+    from report_splitter import iter_text_reports
+    return "".join(iter_text_reports(text_file))
+
 def get_file_prefix(filename):
     """Extract the numeric prefix from a filename."""
     base_name = os.path.basename(filename)
@@ -34,7 +100,7 @@ def group_related_files(files):
     return file_groups
 
 def merge_data(standard_data, numeric_data):
-    """Merge data from standard and numeric format files."""
+    """Merge the ParsedScans of standard and numeric format files."""
     if not standard_data or not numeric_data:
         return None
         
@@ -42,12 +108,23 @@ def merge_data(standard_data, numeric_data):
     
     # Replace ROI data from numeric format
     for region_num, region_name in REGION_MAP.items():
-        if region_name in numeric_data:
-            merged_data[region_name] = numeric_data[region_name]
+        if numeric_data.has_region(region_name):
+            merged_data.copy_region(numeric_data, region_name)
     
     return merged_data
 
 # Constants
+# Bump whenever xps_report_text would return different text for the same file,
+# so that cached extractions from older versions are not reused.
+EXTRACTOR_VERSION = "3"
+
+STANDARD_ANCHOR = "BODY COMPOSITION: Total Body (Enhanced Analysis)"
+NUMERIC_ANCHOR = "Total Body Custom Results"
+REPORT_ANCHORS = (STANDARD_ANCHOR, NUMERIC_ANCHOR)
+REPORT_ANCHOR_BYTES = tuple(anchor.encode('ascii') for anchor in REPORT_ANCHORS)
+
+VAT_PATTERN = re.compile(r"Estimated Visceral Adipose Tissue\s+Volume\s+Mass\s+Area\s+\d+ cm³\s+(\d+) g")
+
 REGION_MAP = {
     "1": "ROI Rib",
     "2": "ROI Abdomen",
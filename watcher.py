@@ -0,0 +1,210 @@
+"""Watch-folder mode: convert scanner exports as they land.
+
+A FolderWatcher follows one input directory, waits until each new file has
+stopped changing, pairs files by numeric prefix the same way
+group_related_files does, and writes the per-file outputs straight away.
+New files are picked up through inotify when the optional inotify_simple
+package is available (Linux), and by polling the directory otherwise. Shared
+network folders do not always deliver inotify events, so the directory is
+also rescanned periodically when inotify is in use.
+
+Files are converted one work item at a time and nothing is accumulated
+between conversions, so memory use does not grow with the number of scans
+processed. Converted work items are recorded in the output directory's
+manifest, so restarting the watcher does not convert them again. A half
+converted without its partner is kept in the output directory's pairing
+index, so a partner arriving later, even after a restart, still produces
+the merged output. Both are written at most every SAVE_INTERVAL seconds and
+when the watcher stops, not after every file, since each write rewrites the
+whole file.
+"""
+import os
+import threading
+import time
+
+from batch_engine import process_group, is_up_to_date, normalize_studies, INPUT_EXTENSIONS
+from chips_logging import get_logger
+from manifest import Manifest
+from pairing_index import PairingIndex
+from utils import get_file_prefix
+
+log = get_logger("watch")
+
+# Seconds a file's size and modification time must stay unchanged before it
+# is considered fully written
+DEFAULT_SETTLE_TIME = 2.0
+# Seconds the first half of a prefix pair waits for its partner before it is
+# converted on its own
+DEFAULT_PAIR_TIMEOUT = 300.0
+DEFAULT_POLL_INTERVAL = 1.0
+# Full directory rescans while inotify is in use
+RESCAN_INTERVAL = 30.0
+# Seconds between writes of the manifest and pairing index while converting
+SAVE_INTERVAL = 5.0
+
+def _open_inotify(directory):
+    """An inotify_simple.INotify watching directory, or None if unavailable."""
+    try:
+        from inotify_simple import INotify, flags
+    except ImportError:
+        return None
+    try:
+        inotify = INotify()
+        inotify.add_watch(directory, flags.CREATE | flags.MODIFY | flags.CLOSE_WRITE | flags.MOVED_TO)
+    except OSError:
+        return None
+    return inotify
+
+class FolderWatcher:
+    """Converts the input files appearing in input_dir until stop() is called.
+
+    on_result, if given, is called after every work item with the prefix
+    (None for files without one), its files and the counts returned by
+    process_group, which include a 'skipped' count for work items that were
+    already up to date.
+    """
+
+    def __init__(self, input_dir, output_dir, studies, cache=None,
+                 settle_time=DEFAULT_SETTLE_TIME, pair_timeout=DEFAULT_PAIR_TIMEOUT,
+                 poll_interval=DEFAULT_POLL_INTERVAL, use_inotify=True, on_result=None,
+                 multi_report_xps=False):
+        self.input_dir = input_dir
+        self.output_dir = output_dir
+        self.studies = normalize_studies(studies)
+        self.cache = cache
+        self.settle_time = settle_time
+        self.pair_timeout = pair_timeout
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify
+        self.on_result = on_result
+        self.multi_report_xps = multi_report_xps
+        self.manifest = Manifest(output_dir)
+        self.pairing = PairingIndex(output_dir)
+
+        self._candidates = {}  # path -> (size, mtime_ns, unchanged since) while being written
+        self._converted = {}   # path -> (size, mtime_ns) when it was handed over
+        self._waiting = {}     # prefix -> (path, ready at) for the first half of a pair
+        self._last_save = time.monotonic()
+        self._stop = threading.Event()
+
+    def stop(self):
+        """Ask run() to return; safe to call from another thread or a signal handler."""
+        self._stop.set()
+
+    def run(self):
+        inotify = _open_inotify(self.input_dir) if self.use_inotify else None
+        log.info("Watching %s (%s)", self.input_dir, "inotify" if inotify else "polling")
+        try:
+            self._scan()
+            last_scan = time.monotonic()
+            while not self._stop.is_set():
+                if inotify is not None:
+                    for event in inotify.read(timeout=int(self.poll_interval * 1000)):
+                        if event.name:
+                            self._observe(os.path.join(self.input_dir, event.name))
+                    if time.monotonic() - last_scan >= RESCAN_INTERVAL:
+                        self._scan()
+                        last_scan = time.monotonic()
+                else:
+                    self._stop.wait(self.poll_interval)
+                    self._scan()
+                self._check_candidates()
+                self._flush_waiting()
+                self._save()
+        finally:
+            self._save(force=True)
+            if inotify is not None:
+                inotify.close()
+
+    def _save(self, force=False):
+        """Write the pairing index and manifest, if SAVE_INTERVAL has passed or force is set."""
+        if not force and time.monotonic() - self._last_save < SAVE_INTERVAL:
+            return
+        self.pairing.save()
+        self.manifest.save()
+        self._last_save = time.monotonic()
+
+    def _scan(self):
+        present = set()
+        with os.scandir(self.input_dir) as entries:
+            for entry in entries:
+                if entry.name.lower().endswith(INPUT_EXTENSIONS) and entry.is_file():
+                    present.add(entry.path)
+                    self._observe(entry.path)
+        # Forget files that were removed so memory follows the folder contents
+        for path in list(self._converted):
+            if path not in present:
+                del self._converted[path]
+
+    def _observe(self, path):
+        if not path.lower().endswith(INPUT_EXTENSIONS):
+            return
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self._candidates.pop(path, None)
+            return
+        signature = (stat.st_size, stat.st_mtime_ns)
+        if self._converted.get(path) == signature:
+            return
+        previous = self._candidates.get(path)
+        if previous is None or previous[:2] != signature:
+            self._candidates[path] = (*signature, time.monotonic())
+
+    def _check_candidates(self):
+        now = time.monotonic()
+        for path, (size, mtime_ns, since) in list(self._candidates.items()):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                del self._candidates[path]
+                continue
+            signature = (stat.st_size, stat.st_mtime_ns)
+            if signature != (size, mtime_ns):
+                self._candidates[path] = (*signature, now)
+            elif size > 0 and now - since >= self.settle_time:
+                del self._candidates[path]
+                self._converted[path] = signature
+                self._dispatch(path)
+
+    def _dispatch(self, path):
+        """Pair a fully written file with its partner, or hold it until one arrives."""
+        prefix = get_file_prefix(path)
+        if prefix is None:
+            self._convert(None, [path])
+        elif prefix in self._waiting and self._waiting[prefix][0] != path:
+            partner, _ = self._waiting.pop(prefix)
+            self._convert(prefix, [partner, path])
+        elif self.pairing.partner_for(prefix, path) is not None:
+            # The partner was converted alone earlier: merge with its stored result
+            self._convert(prefix, [path])
+        else:
+            self._waiting[prefix] = (path, time.monotonic())
+
+    def _flush_waiting(self):
+        now = time.monotonic()
+        for prefix, (path, since) in list(self._waiting.items()):
+            if now - since >= self.pair_timeout:
+                del self._waiting[prefix]
+                log.info("No partner for %s after %.0f s, converting it alone", path, self.pair_timeout)
+                self._convert(prefix, [path])
+
+    def _convert(self, prefix, files):
+        if is_up_to_date(self.manifest, prefix, files, self.output_dir, self.studies):
+            counts = {'success': 0, 'errors': 0, 'merged': 0, 'merged_with_earlier': 0,
+                      'processed': len(files), 'skipped': len(files)}
+        else:
+            partner = self.pairing.partner_for(prefix, files[0]) if len(files) == 1 else None
+            counts = process_group(prefix, files, self.output_dir, self.studies, self.cache,
+                                   fingerprint_inputs=True, partner=partner,
+                                   multi_report_xps=self.multi_report_xps)
+            counts['skipped'] = 0
+            self.pairing.update(counts)
+            if counts['fingerprints'] and not counts['errors']:
+                for study in self.studies:
+                    self.manifest.record(study, list(counts['fingerprints']), counts['fingerprints'])
+        self._save()  # Also during a long burst of conversions
+        log.info("%s: %d succeeded, %d failed, %d skipped", ";".join(files),
+                 counts['success'], counts['errors'], counts['skipped'])
+        if self.on_result:
+            self.on_result(prefix, files, counts)